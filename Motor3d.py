@@ -1,12 +1,1955 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 import numpy as np
-from mpl_toolkits.mplot3d import Axes3D
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection, Line3DCollection # Import Line3DCollection
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+from multiprocessing import shared_memory
 import os
+import shutil
+import struct
+import sys
+import threading
+import time
+
+# When the module finished its imports, for the startup times of the
+# profile log
+STARTED = time.perf_counter()
+
+# Camera presets as (elevation, azimuth), shared by the view buttons and the
+# batch renderer
+VIEWS = {
+    'front': (0, 0),
+    'back': (0, 180),
+    'left': (0, 90),
+    'right': (0, -90),
+    'top': (90, 0),
+    'bottom': (-90, 0),
+}
+
+# Interval in ms at which the UI checks on a model loading in the background
+LOAD_POLL_MS = 50
+
+# Where parsed models are cached, and how much disk space the cache may use
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', '3d_wireframe_viewer')
+CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# Formats whose vertices load_mesh welds unless told otherwise. STL stores
+# three separate vertices for every triangle
+WELD_FORMATS = ('.stl',)
+
+# Memory the loaded models kept for the "Recent Models" list may use
+RECENT_MODELS_MAX_BYTES = 1024 * 1024 * 1024
+
+# Bump when the layout of a cache entry changes to ignore old entries
+CACHE_VERSION = 2
+
+# Grid resolutions of the coarser levels of detail built for large models,
+# and the size below which a model gets no coarser levels
+LOD_RESOLUTIONS = (256, 128, 64, 32, 16)
+LOD_MIN_PRIMITIVES = 5000
+
+# Default number of segments plus triangles drawn while the view is being
+# dragged, and how long the view must be idle before the full model returns
+LOD_BUDGET = 20000
+LOD_IDLE_MS = 400
+
+# Default angle in degrees between the faces of an edge above which the
+# feature edge mode shows it
+FEATURE_ANGLE = 30
+
+# Most cells along the longest side of the grid that indexes a model for
+# picking, and how many pixels from the cursor a pick may be
+PICK_RESOLUTION = 128
+PICK_RADIUS = 8
+PICK_COLOR = '#ffcc00'
+
+# Number of frames the performance HUD averages over, and the environment
+# variable naming a file that load and frame timings are appended to as
+# JSON lines
+FRAME_HISTORY = 30
+PROFILE_LOG_ENV = 'WIREFRAME_VIEWER_PROFILE'
+
+# Size of the blocks the text (OBJ, ASCII PLY and ASCII STL) readers pull
+# from disk at a time, and number of binary records read at once
+TEXT_BLOCK_SIZE = 16 * 1024 * 1024
+BINARY_CHUNK_RECORDS = 1 << 20
+
+# Text files smaller than this are parsed on one process even when worker
+# processes are allowed, as starting the workers would take longer
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+
+class PhaseTimer:
+    """Adds up the wall time spent in named phases of a load or a frame."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def take(self):
+        """Return the phases timed so far and start over."""
+        phases, self.phases = self.phases, {}
+        return phases
+
+
+def array_nbytes(arrays):
+    """Total size of arrays, counting views that start on the same buffer once."""
+    sizes = {}
+    for array in arrays:
+        if array is not None:
+            sizes[array.__array_interface__['data'][0]] = array.nbytes
+    return sum(sizes.values())
+
+
+def model_nbytes(vertices, faces, geometry):
+    """Memory held by a loaded model's arrays and render buffers."""
+    return array_nbytes([vertices, faces.indices, faces._offsets] + geometry.arrays())
+
+
+class ArrayBuilder:
+    """Array that the streaming readers append blocks of rows to.
+
+    The buffer grows by half whenever it fills up, with ndarray.resize so
+    large buffers are usually extended in place, and result() trims it to
+    the rows written. Peak memory stays close to the size of the result.
+    """
+
+    def __init__(self, dtype, shape=(), capacity=1 << 16):
+        self._array = np.empty((capacity,) + shape, dtype=dtype)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, block):
+        end = self._length + len(block)
+        if end > len(self._array):
+            capacity = max(end, len(self._array) * 3 // 2)
+            self._array.resize((capacity,) + self._array.shape[1:], refcheck=False)
+        self._array[self._length:end] = block
+        self._length = end
+
+    def result(self):
+        self._array.resize((self._length,) + self._array.shape[1:], refcheck=False)
+        return self._array
+
+
+def _line_starts(arr):
+    """Offsets of the first byte of every line in a newline terminated buffer."""
+    ends = np.flatnonzero(arr == ord('\n'))
+    starts = np.empty_like(ends)
+    if len(ends):
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+    return starts, ends - starts
+
+
+def _parse_vertex_records(data):
+    """Convert complete 'v x y z ...' lines to a float32 (N, 3) array."""
+    return np.loadtxt(io.BytesIO(data), dtype=np.float32, usecols=(1, 2, 3), ndmin=2)
+
+
+def _parse_face_records(data, count):
+    """Convert `count` complete face lines to face sizes and raw OBJ indices.
+
+    The keyword of every line must already be replaced by a '0', which can
+    never be a valid OBJ index and therefore marks where each face begins.
+    """
+    if b'/' in data:
+        # Parse every number of the v/vt/vn tokens, then keep the ones that
+        # do not follow a slash
+        arr = np.frombuffer(data, dtype=np.uint8)
+        slash = arr == ord('/')
+        separator = (arr <= ord(' ')) | slash
+        number_start = ~separator
+        number_start[1:] &= separator[:-1]
+        positions = np.flatnonzero(number_start)
+        values = np.fromstring(data.replace(b'/', b' '), dtype=np.int64, sep=' ')
+        if len(values) != len(positions):
+            raise Exception("Malformed face data in OBJ file")
+        values = values[~slash[np.maximum(positions - 1, 0)]]
+    else:
+        values = np.fromstring(data, dtype=np.int64, sep=' ')
+
+    starts = np.flatnonzero(values == 0)
+    if len(starts) != count:
+        raise Exception("Malformed face data in OBJ file")
+    sizes = np.diff(starts, append=len(values)) - 1
+    if np.all(sizes == sizes[0]):
+        indices = values.reshape(count, -1)[:, 1:].ravel()
+    else:
+        indices = np.delete(values, starts)
+    return sizes, indices
+
+
+def _parse_obj_block(data, vertex_base):
+    """Parse a block of complete OBJ lines with NumPy.
+
+    Returns (vertices, face_sizes, face_indices, relative) for the block,
+    with face indices already resolved to 0-based absolute indices and
+    `relative` holding the positions of the indices that were negative
+    (relative to the vertices defined so far) in the file.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    starts, lengths = _line_starts(arr)
+
+    # Separate the v/f records in bulk by their keyword
+    keyword = arr[starts]
+    separated = (lengths > 1) & (arr[np.minimum(starts + 1, len(arr) - 1)] <= ord(' '))
+    is_vertex = separated & (keyword == ord('v'))
+    is_face = separated & (keyword == ord('f'))
+
+    vertices = np.zeros((0, 3), dtype=np.float32)
+    if is_vertex.all():
+        # Pure run of vertex records, the bulk of every large OBJ file
+        vertices = _parse_vertex_records(data)
+    elif is_vertex.any():
+        vertices = _parse_vertex_records(arr[np.repeat(is_vertex, lengths + 1)].tobytes())
+    if not is_face.any():
+        return (vertices, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                np.zeros(0, dtype=np.int64))
+
+    if is_face.all():
+        face_bytes = arr.copy()
+        face_bytes[starts] = ord('0')
+    else:
+        face_bytes = arr[np.repeat(is_face, lengths + 1)]
+        face_bytes[np.cumsum(lengths[is_face] + 1) - (lengths[is_face] + 1)] = ord('0')
+    sizes, indices = _parse_face_records(face_bytes.tobytes(), int(is_face.sum()))
+
+    # Negative indices are relative to the vertices defined so far
+    defined = vertex_base + np.cumsum(is_vertex)[is_face]
+    relative = indices < 0
+    indices = np.where(relative, np.repeat(defined, sizes) + indices, indices - 1)
+    return vertices, sizes.astype(np.int32), indices.astype(np.int32), np.flatnonzero(relative)
+
+
+def _read_line_blocks(file, block_size):
+    """Yield the file contents in blocks that always end on a line break."""
+    pending = b''
+    while True:
+        chunk = file.read(block_size)
+        if not chunk:
+            if pending.strip():
+                yield pending + b'\n'
+            return
+        cut = chunk.rfind(b'\n') + 1
+        if not cut:
+            pending += chunk
+            continue
+        yield b''.join((pending, memoryview(chunk)[:cut]))
+        pending = chunk[cut:]
+
+
+def read_obj(filename, progress=None, vertex_dtype=np.float32, workers=1):
+    """Read an OBJ file in large blocks and convert its records in bulk.
+
+    Returns vertices of shape (N, 3) (float32 unless `vertex_dtype` says
+    otherwise) plus the int32 size of every face and the int32 vertex
+    indices of all faces laid end to end. `progress`, if given, is called
+    as progress(bytes_read, total_bytes) after every block. Large files are
+    split across up to `workers` processes.
+    """
+    vertices = ArrayBuilder(vertex_dtype, (3,))
+    face_sizes = ArrayBuilder(np.int32)
+    face_indices = ArrayBuilder(np.int32)
+    total = os.path.getsize(filename)
+
+    def add_block(block_vertices, sizes, indices, relative):
+        # Relative indices were resolved against the vertices of the block only
+        indices[relative] += len(vertices)
+        vertices.append(block_vertices)
+        face_sizes.append(sizes)
+        face_indices.append(indices)
+
+    if workers > 1 and total >= PARALLEL_MIN_BYTES:
+        with open(filename, 'rb') as file:
+            ranges = _line_ranges(file, 0, total, TEXT_BLOCK_SIZE)
+        jobs = [(start, end, 'obj', None) for start, end in ranges]
+        _parse_in_parallel(filename, jobs, workers, lambda job, arrays: add_block(*arrays), progress)
+    else:
+        with open(filename, 'rb') as file:
+            for data in _read_line_blocks(file, TEXT_BLOCK_SIZE):
+                add_block(*_parse_obj_block(data, 0))
+                if progress:
+                    progress(file.tell(), total)
+
+    return vertices.result(), face_sizes.result(), face_indices.result()
+
+
+# Parallel parsing: large text files are cut into byte ranges that start and
+# end on line breaks, worker processes parse the ranges and hand their arrays
+# back through shared memory, and the arrays are stitched together in order
+
+def _line_ranges(file, start, end, size):
+    """Split bytes [start, end) of a file into line aligned ranges of about
+    `size` bytes each."""
+    bounds = [start]
+    while bounds[-1] + size < end:
+        file.seek(bounds[-1] + size)
+        file.readline()
+        if file.tell() >= end:
+            break
+        bounds.append(file.tell())
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _share_arrays(arrays):
+    """Copy arrays into a new shared memory block.
+
+    Returns the name of the block and the (dtype, shape, offset) layout of
+    the arrays in it, which is all that has to be pickled back.
+    """
+    layout = []
+    size = 0
+    for array in arrays:
+        layout.append((array.dtype.str, array.shape, size))
+        size += (array.nbytes + 63) // 64 * 64
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for array, (dtype, shape, offset) in zip(arrays, layout):
+        np.ndarray(shape, dtype, memory.buf, offset)[...] = array
+    memory.close()
+    return memory.name, layout
+
+
+def _parse_text_range(filename, start, end, kind, options):
+    """Parse one line aligned range of a text model file on a worker process."""
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    if not data.endswith(b'\n'):
+        data += b'\n'
+
+    if kind == 'obj':
+        arrays = _parse_obj_block(data, 0)
+    elif kind == 'vertex':
+        arrays = (np.loadtxt(io.BytesIO(data), dtype=np.float32, usecols=options, ndmin=2),)
+    else:
+        arrays = _parse_ascii_list_element(data, data.count(b'\n'), options)
+    return _share_arrays(arrays)
+
+
+def _parse_in_parallel(filename, jobs, workers, add, progress=None):
+    """Parse (start, end, kind, options) ranges of a file on worker processes.
+
+    `add(job, arrays)` is called with the parsed arrays of every range in
+    file order. The arrays live in shared memory that is released as soon
+    as `add` returns, so it must copy whatever it keeps.
+    """
+    # Spawned rather than forked workers, as the pool is usually started
+    # from the loader thread of a running Tk application
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    total = os.path.getsize(filename)
+    submitted = []
+    added = 0
+    try:
+        # `jobs` may be a generator that is still scanning the file, so the
+        # workers start on the first ranges while later ones are found
+        for job in jobs:
+            submitted.append((job, pool.submit(_parse_text_range, filename, *job)))
+        for job, future in submitted:
+            name, layout = future.result()
+            added += 1
+            memory = shared_memory.SharedMemory(name=name)
+            try:
+                add(job, [np.ndarray(shape, dtype, memory.buf, offset)
+                          for dtype, shape, offset in layout])
+            finally:
+                memory.close()
+                memory.unlink()
+            if progress:
+                progress(min(job[1], total), total)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        # Release the blocks of ranges parsed after a failure or cancel
+        for job, future in submitted[added:]:
+            if not future.cancelled() and future.exception() is None:
+                memory = shared_memory.SharedMemory(name=future.result()[0])
+                memory.close()
+                memory.unlink()
+
+
+# Layout of one binary STL triangle record (50 bytes, little endian)
+STL_RECORD = np.dtype([('normal', '<f4', (3,)),
+                       ('vertices', '<f4', (3, 3)),
+                       ('attribute', '<u2')])
+
+
+def _read_ascii_stl(filename, progress=None, vertex_dtype=np.float32):
+    """Read an ASCII STL file in blocks, three new vertices per facet."""
+    vertices = ArrayBuilder(vertex_dtype, (3,))
+    total = os.path.getsize(filename)
+    with open(filename, 'rb') as file:
+        for data in _read_line_blocks(file, TEXT_BLOCK_SIZE):
+            lines = [line for line in data.split(b'\n') if line.lstrip().startswith(b'vertex')]
+            if lines:
+                vertices.append(_parse_vertex_records(b'\n'.join(lines)))
+            if progress:
+                progress(file.tell(), total)
+    vertices = vertices.result()
+    return vertices[:len(vertices) // 3 * 3]
+
+
+def _read_binary_stl(filename, count, progress=None, vertex_dtype=np.float32):
+    """Map the triangle records of a binary STL file straight into NumPy."""
+    vertices = np.empty((count, 3, 3), dtype=vertex_dtype)
+    if count == 0:
+        return vertices.reshape(-1, 3)
+    records = np.memmap(filename, dtype=STL_RECORD, mode='r', offset=84, shape=(count,))
+    for start in range(0, count, BINARY_CHUNK_RECORDS):
+        end = min(start + BINARY_CHUNK_RECORDS, count)
+        vertices[start:end] = records['vertices'][start:end]
+        if progress:
+            progress(84 + end * STL_RECORD.itemsize, 84 + count * STL_RECORD.itemsize)
+    del records
+    return vertices.reshape(-1, 3)
+
+
+def read_stl(filename, progress=None, vertex_dtype=np.float32, workers=1):
+    """Read a binary or ASCII STL file, always on the calling process.
+
+    The format is told apart by the triangle count in the binary header:
+    a file whose size matches 84 + 50 * count is binary, even when its
+    header starts with 'solid' as some exporters write it. Returns the same
+    (vertices, face_sizes, face_indices) triple as read_obj.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as file:
+        header = file.read(84)
+
+    count = int(np.frombuffer(header, dtype='<u4', count=1, offset=80)[0]) if size >= 84 else -1
+    if size == 84 + STL_RECORD.itemsize * count:
+        vertices = _read_binary_stl(filename, count, progress, vertex_dtype)
+    elif header.lstrip().startswith(b'solid'):
+        vertices = _read_ascii_stl(filename, progress, vertex_dtype)
+    else:
+        raise Exception("Corrupt or truncated STL file")
+
+    triangle_count = len(vertices) // 3
+    return (vertices, np.full(triangle_count, 3, dtype=np.int32),
+            np.arange(3 * triangle_count, dtype=np.int32))
+
+
+# NumPy type codes of the PLY property types
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def _read_ply_header(file):
+    """Parse a PLY header into its format and element schema.
+
+    Every element is a (name, count, properties) tuple and every property a
+    (name, type, count_type) tuple, where count_type is None for scalar
+    properties and the type of the length prefix for list properties.
+    """
+    if file.readline().strip() != b'ply':
+        raise Exception("Not a PLY file")
+
+    file_format = None
+    elements = []
+    while True:
+        line = file.readline()
+        if not line:
+            raise Exception("PLY header has no end_header line")
+        parts = line.decode('ascii', 'replace').split()
+        if not parts:
+            continue
+        if parts[0] == 'format':
+            file_format = parts[1]
+        elif parts[0] == 'element':
+            elements.append((parts[1], int(parts[2]), []))
+        elif parts[0] == 'property' and parts[1] == 'list':
+            elements[-1][2].append((parts[4], PLY_TYPES[parts[3]], PLY_TYPES[parts[2]]))
+        elif parts[0] == 'property':
+            elements[-1][2].append((parts[2], PLY_TYPES[parts[1]], None))
+        elif parts[0] == 'end_header':
+            break
+
+    if file_format not in ('ascii', 'binary_little_endian', 'binary_big_endian'):
+        raise Exception(f"Unsupported PLY format: {file_format}")
+    return file_format, elements
+
+
+def _ply_index_property(properties):
+    """Position of the list property holding the face vertex indices."""
+    lists = [i for i, prop in enumerate(properties) if prop[2] is not None]
+    for i in lists:
+        if properties[i][0] in ('vertex_indices', 'vertex_index'):
+            return i
+    return lists[0] if lists else None
+
+
+def _ply_vertices(records, out):
+    """Copy the x, y, z fields of a vertex record array into rows of `out`."""
+    for axis, name in enumerate('xyz'):
+        out[:, axis] = records[name]
+
+
+class _LineReader:
+    """Hands out the lines of a text file in blocks of a given line count,
+    for formats like ASCII PLY whose sections are counted in lines."""
+
+    def __init__(self, file, block_size):
+        self.file = file
+        self.block_size = block_size
+        self.pending = b''
+
+    def lines(self, count):
+        """Yield (data, lines) blocks of whole lines, `count` lines in all."""
+        while count > 0:
+            newlines = np.flatnonzero(np.frombuffer(self.pending, dtype=np.uint8) == 10)
+            if not len(newlines):
+                block = self.file.read(self.block_size)
+                if not block:
+                    if not self.pending.strip():
+                        raise Exception("Truncated PLY file")
+                    block = b'\n'  # Last line without a line break
+                self.pending += block
+                continue
+            taken = min(count, len(newlines))
+            cut = newlines[taken - 1] + 1
+            data, self.pending = self.pending[:cut], self.pending[cut:]
+            count -= taken
+            yield data, taken
+
+
+def _read_binary_list_element(file, count, properties, endian):
+    """Read a binary element with list properties, such as the faces.
+
+    The common case where every list has the same length is read with one
+    fixed-size structured dtype; otherwise the records are walked one by
+    one to find their offsets and the indices are gathered afterwards.
+    Returns the size and the indices of the index list of every record.
+    """
+    target = _ply_index_property(properties)
+    start = file.tell()
+
+    if count and sum(prop[2] is not None for prop in properties) == 1:
+        prefix = sum(np.dtype(prop[1]).itemsize for prop in properties[:target])
+        count_type = np.dtype(endian + properties[target][2])
+        file.seek(start + prefix)
+        length = int(np.frombuffer(file.read(count_type.itemsize), dtype=count_type)[0])
+        file.seek(start)
+
+        fields = []
+        for i, (name, prop_type, prop_count_type) in enumerate(properties):
+            if i == target:
+                fields.append(('length', endian + prop_count_type))
+                fields.append(('items', endian + prop_type, (length,)))
+            else:
+                fields.append((f'field{i}', endian + prop_type))
+        indices = np.empty((count, length), dtype=np.int32)
+        for first in range(0, count, BINARY_CHUNK_RECORDS):
+            records = np.fromfile(file, dtype=np.dtype(fields), count=min(BINARY_CHUNK_RECORDS, count - first))
+            if len(records) < min(BINARY_CHUNK_RECORDS, count - first) or np.any(records['length'] != length):
+                break
+            indices[first:first + len(records)] = records['items']
+        else:
+            return np.full(count, length, dtype=np.int32), indices.ravel()
+        del indices
+        file.seek(start)
+
+    # Variable-length lists: walk the records to find where each one starts
+    data = file.read()
+    layout = []
+    for name, prop_type, prop_count_type in properties:
+        if prop_count_type is None:
+            layout.append((np.dtype(prop_type).itemsize, None, 0))
+        else:
+            length_format = struct.Struct(endian + np.dtype(prop_count_type).char)
+            layout.append((length_format.size, length_format, np.dtype(prop_type).itemsize))
+
+    offsets = np.empty(count, dtype=np.int64)
+    sizes = np.empty(count, dtype=np.int64)
+    position = 0
+    try:
+        for record in range(count):
+            for i, (size, length_format, item_size) in enumerate(layout):
+                if length_format is None:
+                    position += size
+                    continue
+                length = length_format.unpack_from(data, position)[0]
+                position += size
+                if i == target:
+                    offsets[record] = position
+                    sizes[record] = length
+                position += length * item_size
+    except struct.error:
+        raise Exception("Truncated PLY file")
+    if position > len(data):
+        raise Exception("Truncated PLY file")
+    file.seek(start + position)
+
+    item_type = np.dtype(endian + properties[target][1])
+    byte_counts = sizes * item_type.itemsize
+    first = np.cumsum(byte_counts) - byte_counts
+    picks = np.repeat(offsets - first, byte_counts) + np.arange(byte_counts.sum())
+    raw = np.frombuffer(data, dtype=np.uint8)[picks]
+    return sizes.astype(np.int32), raw.view(item_type).astype(np.int32)
+
+
+def _parse_ascii_list_element(data, count, properties):
+    """Parse the lines of an ASCII element with list properties."""
+    target = _ply_index_property(properties)
+    values = np.fromstring(data, dtype=np.float64, sep=' ')
+
+    if len(properties) == 1 and count:
+        # All records are '<n> i1 ... in'; check if n is the same everywhere
+        length = int(values[0])
+        if values.size == count * (length + 1) and np.all(values[::length + 1] == length):
+            return (np.full(count, length, dtype=np.int32),
+                    values.reshape(count, -1)[:, 1:].astype(np.int32).ravel())
+
+    offsets = np.empty(count, dtype=np.int64)
+    sizes = np.empty(count, dtype=np.int64)
+    position = 0
+    for record in range(count):
+        for i, prop in enumerate(properties):
+            if prop[2] is None:
+                position += 1
+                continue
+            length = int(values[position])
+            if i == target:
+                offsets[record] = position + 1
+                sizes[record] = length
+            position += length + 1
+    if position != values.size:
+        raise Exception("Malformed face data in PLY file")
+
+    first = np.cumsum(sizes) - sizes
+    picks = np.repeat(offsets - first, sizes) + np.arange(sizes.sum())
+    return sizes.astype(np.int32), values[picks].astype(np.int32)
+
+
+def _check_ply_element(name, properties):
+    """Reject vertex elements the readers cannot take positions from."""
+    if name == 'vertex' and not all(axis in [p[0] for p in properties] for axis in 'xyz'):
+        raise Exception("PLY vertices have no x, y, z properties")
+    if name == 'vertex' and any(prop[2] is not None for prop in properties):
+        raise Exception("PLY vertices with list properties are not supported")
+
+
+def read_ply(filename, progress=None, vertex_dtype=np.float32, workers=1):
+    """Read an ASCII, binary little endian or binary big endian PLY file.
+
+    The header is parsed into a full property schema, so vertices can carry
+    any extra properties (normals, colors, confidence...) in any order.
+    Elements are streamed in blocks into arrays of their final size, and
+    large ASCII files are split across up to `workers` processes.
+    Returns the same (vertices, face_sizes, face_indices) triple as read_obj.
+    """
+    vertices = np.zeros((0, 3), dtype=vertex_dtype)
+    face_sizes = np.zeros(0, dtype=np.int32)
+    face_indices = np.zeros(0, dtype=np.int32)
+    total = os.path.getsize(filename)
+
+    with open(filename, 'rb') as file:
+        file_format, elements = _read_ply_header(file)
+        if file_format == 'ascii' and workers > 1 and total >= PARALLEL_MIN_BYTES:
+            return _read_ascii_ply_parallel(filename, file, elements, progress,
+                                            vertex_dtype, workers)
+        if file_format == 'ascii':
+            reader = _LineReader(file, TEXT_BLOCK_SIZE)
+
+        for name, count, properties in elements:
+            _check_ply_element(name, properties)
+            scalar = all(prop[2] is None for prop in properties)
+
+            if file_format == 'ascii':
+                if name == 'vertex':
+                    columns = [[p[0] for p in properties].index(axis) for axis in 'xyz']
+                    vertices = np.empty((count, 3), dtype=vertex_dtype)
+                    first = 0
+                    for data, lines in reader.lines(count):
+                        vertices[first:first + lines] = np.loadtxt(
+                            io.BytesIO(data), dtype=np.float32, usecols=columns, ndmin=2)
+                        first += lines
+                        if progress:
+                            progress(file.tell(), total)
+                elif name == 'face' and _ply_index_property(properties) is not None:
+                    sizes = ArrayBuilder(np.int32, capacity=max(count, 1))
+                    indices = ArrayBuilder(np.int32, capacity=max(3 * count, 1))
+                    for data, lines in reader.lines(count):
+                        block_sizes, block_indices = _parse_ascii_list_element(data, lines, properties)
+                        sizes.append(block_sizes)
+                        indices.append(block_indices)
+                        if progress:
+                            progress(file.tell(), total)
+                    face_sizes, face_indices = sizes.result(), indices.result()
+                else:
+                    for _ in reader.lines(count):
+                        pass
+                continue
+
+            endian = '<' if file_format == 'binary_little_endian' else '>'
+            if scalar:
+                dtype = np.dtype([(prop[0], endian + prop[1]) for prop in properties])
+                if name != 'vertex':
+                    file.seek(count * dtype.itemsize, os.SEEK_CUR)
+                    if file.tell() > total:
+                        raise Exception("Truncated PLY file")
+                    continue
+                vertices = np.empty((count, 3), dtype=vertex_dtype)
+                for first in range(0, count, BINARY_CHUNK_RECORDS):
+                    records = np.fromfile(file, dtype=dtype, count=min(BINARY_CHUNK_RECORDS, count - first))
+                    if len(records) != min(BINARY_CHUNK_RECORDS, count - first):
+                        raise Exception("Truncated PLY file")
+                    _ply_vertices(records, vertices[first:first + len(records)])
+                    if progress:
+                        progress(file.tell(), total)
+            else:
+                sizes, indices = _read_binary_list_element(file, count, properties, endian)
+                if name == 'face':
+                    face_sizes, face_indices = sizes, indices
+            if progress:
+                progress(file.tell(), total)
+
+    return vertices, face_sizes, face_indices
+
+
+def _read_ascii_ply_parallel(filename, file, elements, progress, vertex_dtype, workers):
+    """Parse the vertex and face elements of an ASCII PLY file on worker
+    processes. `file` must be positioned right after the header."""
+    vertices = np.zeros((0, 3), dtype=vertex_dtype)
+    face_sizes = ArrayBuilder(np.int32)
+    face_indices = ArrayBuilder(np.int32)
+    filled = 0
+
+    def find_jobs():
+        # Elements are counted in lines, so their byte ranges are found by
+        # scanning the line breaks; every block of lines becomes one job
+        nonlocal vertices
+        reader = _LineReader(file, TEXT_BLOCK_SIZE)
+        position = file.tell()
+        for name, count, properties in elements:
+            _check_ply_element(name, properties)
+            if name == 'vertex':
+                vertices = np.empty((count, 3), dtype=vertex_dtype)
+                options = [[p[0] for p in properties].index(axis) for axis in 'xyz']
+            elif name == 'face' and _ply_index_property(properties) is not None:
+                options = properties
+            else:
+                name = None
+            for data, lines in reader.lines(count):
+                if name is not None:
+                    yield position, position + len(data), name, options
+                position += len(data)
+
+    def add(job, arrays):
+        nonlocal filled
+        if job[2] == 'vertex':
+            if filled + len(arrays[0]) > len(vertices):
+                raise Exception("Malformed vertex data in PLY file")
+            vertices[filled:filled + len(arrays[0])] = arrays[0]
+            filled += len(arrays[0])
+        else:
+            face_sizes.append(arrays[0])
+            face_indices.append(arrays[1])
+
+    _parse_in_parallel(filename, find_jobs(), workers, add, progress)
+    if filled != len(vertices):
+        raise Exception("Malformed vertex data in PLY file")
+    return vertices, face_sizes.result(), face_indices.result()
+
+
+def _unique_keys(keys):
+    """Sorted unique values of an int64 key array, sorting `keys` in place.
+
+    Sorting and comparing neighbours is considerably faster than np.unique
+    on the tens of millions of keys a large mesh produces.
+    """
+    keys.sort()
+    keep = np.empty(len(keys), dtype=bool)
+    keep[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def weld_vertices(vertices, indices, tolerance=0.0):
+    """Merge coincident vertices and point the face indices at the survivors.
+
+    Vertices match when their coordinates are bitwise equal, or with a
+    `tolerance` > 0 when they snap to the same cell of a grid with that
+    spacing. The first vertex of every group is kept, in file order.
+    Returns the welded vertices and the remapped indices.
+    """
+    if tolerance > 0:
+        keys = np.floor(vertices / np.float64(tolerance) + 0.5).astype(np.int64).view(np.uint64)
+    else:
+        # Compare the bit patterns, with -0.0 turned into 0.0 first
+        bits = np.dtype(f'u{vertices.dtype.itemsize}')
+        keys = (vertices + vertices.dtype.type(0)).view(bits).astype(np.uint64)
+
+    # Sort by a hash of the three keys so equal vertices become neighbours
+    hashes = keys[:, 0] * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= keys[:, 1] * np.uint64(0xC2B2AE3D27D4EB4F)
+    hashes ^= keys[:, 2] * np.uint64(0x165667B19E3779F9)
+    order = np.argsort(hashes)
+    sorted_keys = keys[order]
+    new = np.empty(len(order), dtype=bool)
+    new[:1] = True
+    new[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    hashes = hashes[order]
+    if np.any(new[1:] & (hashes[1:] == hashes[:-1])):
+        # Colliding hashes could keep equal vertices apart, sort by the keys
+        order = np.lexsort(keys.T[::-1])
+        sorted_keys = keys[order]
+        new[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    del keys, sorted_keys, hashes
+
+    # Number the groups by their first vertex to keep the file order
+    starts = np.flatnonzero(new)
+    first = np.minimum.reduceat(order, starts) if len(order) else order
+    rank = np.empty(len(first), dtype=np.int32)
+    rank[np.argsort(first)] = np.arange(len(first), dtype=np.int32)
+    remap = np.empty(len(order), dtype=np.int32)
+    remap[order] = np.repeat(rank, np.diff(starts, append=len(order)))
+    return vertices[np.sort(first)], remap[indices]
+
+
+def _edge_keys(start, end, out):
+    """Write the undirected key of every edge from `start` to `end` into `out`."""
+    np.minimum(start, end, out=out)
+    out <<= 32
+    out |= np.maximum(start, end)
+
+
+class FaceArray:
+    """Faces of a mesh stored as flat int32 arrays (CSR layout).
+
+    `indices` holds the vertex indices of all faces end to end and face i
+    uses indices[offsets[i]:offsets[i + 1]]. All-triangle or all-quad meshes
+    (any mesh whose faces have the same size) skip the offsets array and are
+    also available as an (F, k) view through `uniform`.
+    """
+
+    def __init__(self, sizes, indices):
+        sizes = np.asarray(sizes, dtype=np.int32)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self.count = len(sizes)
+        if not self.count or np.all(sizes == sizes[0]):
+            self.uniform = self.indices.reshape(self.count, sizes[0] if self.count else 3)
+            self._offsets = None
+        else:
+            self.uniform = None
+            self._offsets = np.zeros(self.count + 1, dtype=np.int32)
+            np.cumsum(sizes, out=self._offsets[1:])
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            return np.arange(self.count + 1, dtype=np.int32) * self.uniform.shape[1]
+        return self._offsets
+
+    @property
+    def sizes(self):
+        if self._offsets is None:
+            return np.full(self.count, self.uniform.shape[1], dtype=np.int32)
+        return np.diff(self._offsets)
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + (self._offsets.nbytes if self._offsets is not None else 0)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        offsets = self.offsets
+        return self.indices[offsets[i]:offsets[i + 1]]
+
+    def __iter__(self):
+        if self.uniform is not None:
+            return iter(self.uniform)
+        return iter(np.split(self.indices, self._offsets[1:-1]))
+
+    def edges(self):
+        """Every face edge as an (E, 2) array, shared edges appearing twice."""
+        if self.uniform is not None:
+            if self.uniform.shape[1] < 2:
+                return np.zeros((0, 2), dtype=np.int32)
+            following = np.roll(self.uniform, -1, axis=1)
+            return np.stack((self.uniform, following), axis=-1).reshape(-1, 2)
+
+        # Each index connects to the next one, and the last one of a face
+        # back to the first
+        sizes = self.sizes
+        following = np.arange(1, len(self.indices) + 1)
+        following[self._offsets[1:][sizes > 0] - 1] = self._offsets[:-1][sizes > 0]
+        keep = np.repeat(sizes >= 2, sizes)
+        return np.stack((self.indices[keep], self.indices[following[keep]]), axis=-1)
+
+    def triangulate(self):
+        """Fan-triangulate every face of 3 or more vertices into (T, 3) indices."""
+        if self.uniform is not None:
+            size = self.uniform.shape[1]
+            if size < 3:
+                return np.zeros((0, 3), dtype=np.int32)
+            if size == 3:
+                return self.uniform
+            fan = np.empty((self.count, size - 2, 3), dtype=np.int32)
+            fan[:, :, 0] = self.uniform[:, :1]
+            fan[:, :, 1] = self.uniform[:, 1:-1]
+            fan[:, :, 2] = self.uniform[:, 2:]
+            return fan.reshape(-1, 3)
+
+        counts = np.maximum(self.sizes - 2, 0)
+        first = np.repeat(self._offsets[:-1], counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.stack((self.indices[first], self.indices[first + step + 1],
+                         self.indices[first + step + 2]), axis=-1)
+
+    def unique_edges(self):
+        """Undirected edges of all faces as an (M, 2) int32 array, each once."""
+        # Every edge becomes one int64 key (low << 32 | high), written
+        # straight into a single array to keep temporaries small
+        if self.uniform is not None:
+            size = self.uniform.shape[1] if self.uniform.shape[1] >= 2 else 0
+            keys = np.empty((size, self.count), dtype=np.int64)
+            for corner in range(size):
+                _edge_keys(self.uniform[:, corner], self.uniform[:, (corner + 1) % size], keys[corner])
+        else:
+            edges = self.edges()
+            keys = np.empty((1, len(edges)), dtype=np.int64)
+            _edge_keys(edges[:, 0], edges[:, 1], keys[0])
+            del edges
+        keys = _unique_keys(keys.ravel())
+        edges = np.empty((len(keys), 2), dtype=np.int32)
+        edges[:, 0] = keys >> 32
+        edges[:, 1] = keys & 0xFFFFFFFF
+        return edges
+
+
+class RenderGeometry:
+    """Render buffers derived once from a loaded model.
+
+    The edge and triangle index arrays are built up front; the (M, 2, 3)
+    segment and (N, 3, 3) triangle coordinate arrays the collections are
+    made from are gathered on first use and then kept until the model
+    changes. `levels` holds coarser versions of the model, finest first,
+    once build_levels() has run.
+    """
+
+    def __init__(self, vertices, faces, edges=None, triangles=None):
+        self.vertices = vertices
+        self.edges = faces.unique_edges() if edges is None else edges
+        self.triangles = faces.triangulate() if triangles is None else triangles
+        self.bounds = (vertices.min(axis=0).astype(np.float32),
+                       vertices.max(axis=0).astype(np.float32))
+        self.levels = []
+        self.pick_index = None
+
+    @functools.cached_property
+    def segments(self):
+        return self.vertices[self.edges]
+
+    @functools.cached_property
+    def triangle_coords(self):
+        return self.vertices[self.triangles]
+
+    @functools.cached_property
+    def planes(self):
+        """Plane of every triangle as (nx, ny, nz, -n.v0), the normal
+        following the triangle's winding."""
+        corners = self.triangle_coords.astype(np.float32, copy=False)
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        offsets = np.einsum('ij,ij->i', normals, corners[:, 0])
+        return np.concatenate((normals, -offsets[:, None]), axis=1)
+
+    @functools.cached_property
+    def edge_angles(self):
+        """Angle in degrees between the normals of the two triangles sharing
+        every edge; inf for boundary and non-manifold edges.
+
+        Triangles are matched to edges by their undirected edge key, so the
+        diagonals triangulation adds inside polygons are left out.
+        """
+        keys = np.empty(len(self.edges), dtype=np.int64)
+        _edge_keys(self.edges[:, 0], self.edges[:, 1], keys)
+        order = None
+        if np.any(keys[1:] <= keys[:-1]):
+            order = np.argsort(keys)
+            keys = keys[order]
+
+        # Number of triangles on every edge, and the first and last of them
+        # (equal scattered indices keep the last value written)
+        sides = np.zeros(len(self.edges), dtype=np.int64)
+        first = np.zeros(len(self.edges), dtype=np.int32)
+        last = np.zeros(len(self.edges), dtype=np.int32)
+        side_keys = np.empty(len(self.triangles), dtype=np.int64)
+        matches = []
+        for corner in range(3):
+            _edge_keys(self.triangles[:, corner], self.triangles[:, (corner + 1) % 3], side_keys)
+            found = np.minimum(np.searchsorted(keys, side_keys), max(len(keys) - 1, 0))
+            triangles = np.flatnonzero(keys[found] == side_keys) if len(keys) else found[:0]
+            edge_ids = found[triangles] if order is None else order[found[triangles]]
+            sides += np.bincount(edge_ids, minlength=len(self.edges))
+            last[edge_ids] = triangles
+            matches.append((edge_ids, triangles))
+        for edge_ids, triangles in reversed(matches):
+            first[edge_ids[::-1]] = triangles[::-1]
+        del side_keys, matches, found, triangles, edge_ids
+        manifold = np.flatnonzero(sides == 2)
+
+        # Unit normals as (3, T) rows, which are much faster to compute
+        # component by component than np.cross over columns
+        coords = np.ascontiguousarray(self.vertices.T, dtype=np.float32)
+        origin = coords[:, self.triangles[:, 0]]
+        u = coords[:, self.triangles[:, 1]]
+        u -= origin
+        v = coords[:, self.triangles[:, 2]]
+        v -= origin
+        del coords, origin
+        normals = np.empty_like(u)
+        for axis in range(3):
+            i, j = (axis + 1) % 3, (axis + 2) % 3
+            normals[axis] = u[i] * v[j]
+            normals[axis] -= u[j] * v[i]
+        del u, v
+        lengths = np.sqrt(np.einsum('ij,ij->j', normals, normals))
+        degenerate = lengths == 0
+        normals /= np.where(degenerate, 1, lengths)
+        a, b = first[manifold], last[manifold]
+        cosines = np.einsum('ij,ij->j', normals[:, a], normals[:, b])
+        # Slivers without a normal do not make an edge a feature
+        cosines[degenerate[a] | degenerate[b]] = 1
+
+        angles = np.full(len(self.edges), np.inf, dtype=np.float32)
+        angles[manifold] = np.degrees(np.arccos(np.clip(cosines, -1, 1)))
+        return angles
+
+    def feature_edges(self, threshold):
+        """Boundary and non-manifold edges and those whose faces meet at
+        more than `threshold` degrees."""
+        return self.edges[self.edge_angles > threshold]
+
+    def arrays(self):
+        """Every index and coordinate array built so far, levels included."""
+        arrays = []
+        for geometry in [self] + self.levels:
+            arrays += [geometry.vertices, geometry.edges, geometry.triangles]
+            arrays += [geometry.__dict__.get(name)
+                       for name in ('segments', 'triangle_coords', 'planes', 'edge_angles')]
+        if self.pick_index is not None:
+            arrays += self.pick_index.arrays()
+        return arrays
+
+    def front_facing(self, eye):
+        """Mask of the triangles facing a camera at homogeneous position `eye`."""
+        return self.planes @ eye > 0
+
+    @property
+    def primitives(self):
+        return len(self.edges) + len(self.triangles)
+
+    def cluster(self, resolution):
+        """Vertex-clustering decimation onto a grid of `resolution` cells
+        along the longest side of the bounding box.
+
+        All vertices in a cell merge into their mean; edges and triangles
+        that collapse or become duplicates are dropped. Returns None when
+        the grid would not merge at least half of the vertices.
+        """
+        low, high = self.bounds
+        cell = float(np.max(high - low)) / resolution or 1.0
+        grid = ((self.vertices - low) / cell).astype(np.int64)
+        np.clip(grid, 0, resolution - 1, out=grid)
+        keys = (grid[:, 0] * resolution + grid[:, 1]) * resolution + grid[:, 2]
+        del grid
+
+        # Number the occupied cells in key order
+        order = np.argsort(keys)
+        keys = keys[order]
+        first = np.empty(len(keys), dtype=bool)
+        first[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        cluster = np.empty(len(keys), dtype=np.int32)
+        cluster[order] = np.cumsum(first) - 1
+        count = int(first.sum())
+        if count > len(keys) * 0.5:
+            return None  # The grid is too fine to merge many vertices
+
+        weights = np.bincount(cluster, minlength=count)
+        vertices = np.stack([np.bincount(cluster, self.vertices[:, axis], count)
+                             for axis in range(3)], axis=-1)
+        vertices = (vertices / weights[:, None]).astype(np.float32)
+
+        edges = cluster[self.edges]
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        low_index = np.minimum(edges[:, 0], edges[:, 1]).astype(np.int64)
+        high_index = np.maximum(edges[:, 0], edges[:, 1]).astype(np.int64)
+        keys = _unique_keys((low_index << 32) | high_index)
+        edges = np.stack((keys >> 32, keys & 0xFFFFFFFF), axis=-1).astype(np.int32)
+
+        # Keep the first of every set of triangles on the same three
+        # clusters, with its original winding
+        triangles = cluster[self.triangles]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1]) &
+                              (triangles[:, 1] != triangles[:, 2]) &
+                              (triangles[:, 0] != triangles[:, 2])]
+        corners = np.sort(triangles, axis=1)
+        if count < 1 << 21:
+            # Three cluster numbers pack into one int64, which sorts much
+            # faster than a lexsort over the three columns
+            corners = corners.astype(np.int64)
+            keys = (corners[:, 0] << 42) | (corners[:, 1] << 21) | corners[:, 2]
+            order = np.argsort(keys)
+            keys = keys[order]
+            first = np.empty(len(keys), dtype=bool)
+            first[:1] = True
+            np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        else:
+            order = np.lexsort((corners[:, 2], corners[:, 1], corners[:, 0]))
+            corners = corners[order]
+            first = np.ones(len(corners), dtype=bool)
+            first[1:] = np.any(corners[1:] != corners[:-1], axis=1)
+        triangles = triangles[order[first]]
+
+        return RenderGeometry(vertices, None, edges, triangles)
+
+    def build_levels(self):
+        """Build the coarser levels of detail of a large model."""
+        self.levels = []
+        previous = self
+        for resolution in LOD_RESOLUTIONS:
+            if previous.primitives <= LOD_MIN_PRIMITIVES:
+                break
+            level = previous.cluster(resolution)
+            if level is None:
+                continue  # Try a coarser grid
+            if level.primitives > previous.primitives * 0.75:
+                break  # Clustering does not simplify this model (e.g. a triangle soup)
+            self.levels.append(level)
+            previous = level
+
+    def build_pick_index(self):
+        self.pick_index = PickIndex(self.vertices, self.edges, self.bounds)
+
+    def level_for(self, budget, edges=True, triangles=True):
+        """Finest level of detail whose shown edges and triangles fit in
+        `budget`, or the coarsest level if none does."""
+        for level in [self] + self.levels:
+            cost = (len(level.edges) if edges else 0) + (len(level.triangles) if triangles else 0)
+            if cost <= budget:
+                return level
+        return level
+
+
+def _gather_ranges(starts, ends):
+    """Concatenation of arange(start, end) for every pair of bounds."""
+    lengths = ends - starts
+    firsts = np.cumsum(lengths) - lengths
+    return (np.arange(int(lengths.sum())) - np.repeat(firsts, lengths) +
+            np.repeat(starts, lengths))
+
+
+class PickIndex:
+    """Uniform grid over a model's vertices and edges for picking on screen.
+
+    Vertices are bucketed by the cell they lie in and edges by the cell of
+    their first vertex, both sorted by cell so that the members of a cell
+    are a contiguous range. A cell's box is grown by its longest edge, so it
+    encloses everything bucketed in it: cells whose projected box is away
+    from the cursor are skipped without looking at their members, and only
+    the few candidates left are projected and measured.
+
+    Projected boxes are cached for the last camera, so moving the cursor
+    over a still view costs one pass over the occupied cells.
+    """
+
+    def __init__(self, vertices, edges, bounds, resolution=None):
+        if resolution is None:
+            # Surfaces occupy about resolution ** 2 cells; aim for a hundred
+            # or so vertices in each
+            resolution = int(np.clip(np.sqrt(len(vertices) / 128), 16, PICK_RESOLUTION))
+        low, high = bounds
+        self.low = low
+        self.cell = float(np.max(high - low)) / resolution or 1.0
+        self.resolution = resolution
+        self.vertices = vertices
+        self.edges = edges
+
+        vertex_keys = self.cell_keys(vertices)
+        self.vertex_order = np.argsort(vertex_keys, kind='stable').astype(np.int32)
+        edge_keys = vertex_keys[edges[:, 0]]
+        self.edge_order = np.argsort(edge_keys, kind='stable').astype(np.int32)
+
+        # Cell keys are below resolution ** 3, so the ranges of the sorted
+        # members of every cell come from their counts
+        cells = resolution ** 3
+        vertex_counts = np.bincount(vertex_keys, minlength=cells)
+        edge_counts = np.bincount(edge_keys, minlength=cells)
+        self.cells = np.flatnonzero(vertex_counts | edge_counts).astype(np.int32)
+        self.vertex_ends = np.cumsum(vertex_counts)[self.cells]
+        self.vertex_starts = self.vertex_ends - vertex_counts[self.cells]
+        self.edge_ends = np.cumsum(edge_counts)[self.cells]
+        self.edge_starts = self.edge_ends - edge_counts[self.cells]
+        del vertex_keys, edge_keys, vertex_counts, edge_counts
+
+        # Edges are bucketed by their first vertex, so a cell's box has to
+        # grow by its longest edge to enclose them
+        sorted_edges = edges[self.edge_order]
+        lengths = np.linalg.norm(vertices[sorted_edges[:, 1]].astype(np.float32) -
+                                 vertices[sorted_edges[:, 0]], axis=1)
+        del sorted_edges
+        self.margins = np.zeros(len(self.cells), dtype=np.float32)
+        has_edges = self.edge_ends > self.edge_starts
+        if has_edges.any():
+            self.margins[has_edges] = np.maximum.reduceat(lengths, self.edge_starts[has_edges])
+
+        self._screen_for = None
+        self._boxes = None
+
+    def cell_keys(self, points):
+        resolution = self.resolution
+        grid = ((points - self.low) / np.float32(self.cell)).astype(np.int32)
+        np.clip(grid, 0, resolution - 1, out=grid)
+        return (grid[:, 0] * resolution + grid[:, 1]) * resolution + grid[:, 2]
+
+    def arrays(self):
+        return [self.vertex_order, self.edge_order, self.cells, self.vertex_starts,
+                self.vertex_ends, self.edge_starts, self.edge_ends, self.margins]
+
+    def screen_boxes(self, project, key):
+        """Screen bounding box (x0, y0, x1, y1) of every cell for the camera
+        `project` stands for, projected again only when `key` changes."""
+        if key != self._screen_for:
+            resolution = self.resolution
+            cells = np.stack((self.cells // (resolution * resolution),
+                              self.cells // resolution % resolution,
+                              self.cells % resolution), axis=-1)
+            low = self.low + cells * np.float32(self.cell) - self.margins[:, None]
+            high = low + np.float32(self.cell) + 2 * self.margins[:, None]
+            corners = np.stack([np.where([x, y, z], high, low)
+                                for x in (0, 1) for y in (0, 1) for z in (0, 1)], axis=1)
+            screen = project(corners.reshape(-1, 3)).reshape(len(cells), 8, 2)
+            self._boxes = np.concatenate((screen.min(axis=1), screen.max(axis=1)), axis=1)
+            self._screen_for = key
+        return self._boxes
+
+    def pick(self, project, key, x, y, radius=PICK_RADIUS):
+        """Nearest vertex and edge to screen point (x, y).
+
+        `project` maps (N, 3) data points to (N, 2) screen points. Returns
+        ('vertex', index, distance) when a vertex is within `radius` pixels,
+        else ('edge', index, distance) for the nearest edge within it, else
+        None.
+        """
+        boxes = self.screen_boxes(project, key)
+        hit = np.flatnonzero((boxes[:, 0] - radius <= x) & (x <= boxes[:, 2] + radius) &
+                             (boxes[:, 1] - radius <= y) & (y <= boxes[:, 3] + radius))
+        point = np.array([x, y], dtype=np.float64)
+
+        vertices = self.vertex_order[_gather_ranges(self.vertex_starts[hit], self.vertex_ends[hit])]
+        if len(vertices):
+            distances = np.linalg.norm(project(self.vertices[vertices]) - point, axis=1)
+            nearest = np.argmin(distances)
+            if distances[nearest] <= radius:
+                return 'vertex', int(vertices[nearest]), float(distances[nearest])
+
+        edges = self.edge_order[_gather_ranges(self.edge_starts[hit], self.edge_ends[hit])]
+        if len(edges):
+            ends = self.edges[edges]
+            start = project(self.vertices[ends[:, 0]])
+            direction = project(self.vertices[ends[:, 1]]) - start
+            length = np.einsum('ij,ij->i', direction, direction)
+            along = np.einsum('ij,ij->i', point - start, direction) / np.maximum(length, 1e-12)
+            closest = start + np.clip(along, 0, 1)[:, None] * direction
+            distances = np.linalg.norm(closest - point, axis=1)
+            nearest = np.argmin(distances)
+            if distances[nearest] <= radius:
+                return 'edge', int(edges[nearest]), float(distances[nearest])
+        return None
+
+
+def camera_position(M):
+    """Homogeneous data-space position of the camera of projection matrix M.
+
+    The camera is the point that projects onto nothing, i.e. the null space
+    of the x, y and w rows of M. Perspective cameras come back with w = 1;
+    orthographic ones as a direction towards the viewer with w = 0.
+    """
+    eye = np.linalg.svd(M[[0, 1, 3]])[2][-1]
+    if abs(eye[3]) > 1e-12:
+        return eye / eye[3]
+    # Moving towards the viewer decreases the projected depth
+    return -eye if M[2, :3] @ eye[:3] > 0 else eye
+
+
+# matplotlib and the classes built on it, set by import_matplotlib()
+Figure = FigureCanvasTkAgg = Poly3DCollection = Line3DCollection = None
+CulledPoly3DCollection = FeatureLine3DCollection = TimedFigureCanvas = None
+
+
+def import_matplotlib():
+    """Import matplotlib on first use.
+
+    Importing matplotlib takes most of the startup time, so the viewer
+    shows its window first and creates the plot once Tk is idle.
+    """
+    global Figure, FigureCanvasTkAgg, Poly3DCollection, Line3DCollection
+    global CulledPoly3DCollection, FeatureLine3DCollection, TimedFigureCanvas
+    if Figure is not None:
+        return
+
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection, Line3DCollection
+
+    class CulledPoly3DCollection(Poly3DCollection):
+        """Poly3DCollection of a model's triangles that can leave out the ones
+        facing away from the camera.
+
+        The visible triangles are picked again whenever the view changes,
+        before matplotlib projects and depth sorts them.
+        """
+
+        def __init__(self, geometry, *args, culling=False, **kwargs):
+            self.geometry = geometry
+            self.culling = culling
+            self._culled_for = None
+            super().__init__(geometry.triangle_coords, *args, **kwargs)
+
+        def do_3d_projection(self):
+            eye = camera_position(self.axes.M) if self.culling else None
+            key = None if eye is None else tuple(eye)
+            if key != self._culled_for:
+                if eye is None:
+                    self.set_verts(self.geometry.triangle_coords)
+                else:
+                    self.set_verts(self.geometry.triangle_coords[self.geometry.front_facing(eye)])
+                self._culled_for = key
+            return super().do_3d_projection()
+
+    class FeatureLine3DCollection(Line3DCollection):
+        """Line3DCollection of a model's edges that can show only its feature
+        edges, those sharper than `feature_angle` degrees.
+
+        The segments are gathered again before projection whenever the
+        angle changes, from the edge angles the geometry computed once.
+        """
+
+        def __init__(self, geometry, *args, feature_angle=None, **kwargs):
+            self.geometry = geometry
+            self.feature_angle = feature_angle
+            self._shown_for = feature_angle
+            super().__init__(self.edge_segments(), *args, **kwargs)
+
+        def edge_segments(self):
+            if self.feature_angle is None:
+                return self.geometry.segments
+            return self.geometry.vertices[self.geometry.feature_edges(self.feature_angle)]
+
+        def do_3d_projection(self):
+            if self.feature_angle != self._shown_for:
+                self.set_segments(self.edge_segments())
+                self._shown_for = self.feature_angle
+            return super().do_3d_projection()
+
+    class TimedFigureCanvas(FigureCanvasTkAgg):
+        """Tk canvas that passes the duration of every draw to `on_draw`."""
+
+        on_draw = None
+
+        def draw(self):
+            start = time.perf_counter()
+            super().draw()
+            if self.on_draw is not None:
+                self.on_draw(time.perf_counter() - start)
+
+
+def view_axes(elev, azim):
+    """Screen right, screen up and out-of-screen unit vectors of a camera
+    at (elev, azim), following mplot3d's conventions."""
+    elev, azim = np.deg2rad(elev), np.deg2rad(azim)
+    w = np.array([np.cos(elev) * np.cos(azim), np.cos(elev) * np.sin(azim), np.sin(elev)])
+    # Past the poles the model is seen upside down
+    up = np.array([0.0, 0.0, -1.0 if abs(np.arctan2(np.sin(elev), np.cos(elev))) > np.pi / 2 else 1.0])
+    u = np.cross(up, w)
+    u /= np.linalg.norm(u)
+    v = np.cross(w, u)
+    return u, v, w
+
+
+def hex_to_rgb(color):
+    color = color.lstrip('#')
+    return np.array([int(color[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+
+
+class SoftwareRenderer:
+    """Rasterizes a RenderGeometry into an RGB NumPy image.
+
+    Vertices are projected with one matrix multiply (orthographic camera),
+    triangles are filled with flat shading against a depth buffer and edges
+    and vertices are drawn on top, hidden behind nearer faces. Everything
+    is vectorized over primitives and covered pixels.
+    """
+
+    # Upper bound on candidate pixels processed in one batch
+    CHUNK_PIXELS = 1 << 22
+
+    # Depth buffer resolution and how far behind a face a line may still show
+    DEPTH_LEVELS = (1 << 31) - 1
+    DEPTH_BIAS = 0.002
+
+    def view_transform(self, bounds, width, height, elev, azim, zoom):
+        """Matrix and offset taking data points to screen x, y (pixels, y
+        down) and depth, and the out-of-screen direction of the camera."""
+        u, v, w = view_axes(elev, azim)
+        low, high = bounds
+        center = (low.astype(np.float64) + high) / 2
+        radius = max(float(np.linalg.norm(high.astype(np.float64) - low)) / 2, 1e-12)
+        scale = zoom * 0.45 * min(width, height) / radius
+
+        view = (np.stack((u, -v, w)) * scale).astype(np.float32)
+        offset = np.array([width / 2, height / 2, 0], dtype=np.float32) - view @ center.astype(np.float32)
+        return view, offset, w
+
+    def project(self, geometry, width, height, elev, azim, zoom):
+        """Screen x, y (pixels, y down) and depth (towards the viewer) of
+        every vertex."""
+        view, offset, w = self.view_transform(geometry.bounds, width, height, elev, azim, zoom)
+        projected = geometry.vertices @ view.T
+        projected += offset
+        return projected[:, 0], projected[:, 1], projected[:, 2], w
+
+    def render(self, geometry, width, height, elev, azim, zoom=1.0, wireframe=True,
+               faces=False, culling=False, wireframe_color='#00ffff',
+               vertex_color='#00ffff', face_color='#007acc', background_color='#000000',
+               feature_angle=None):
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[:] = hex_to_rgb(background_color)
+        x, y, z, eye = self.project(geometry, width, height, elev, azim, zoom)
+
+        # Depth is quantized over the model's depth range
+        z_low = float(z.min()) if len(z) else 0.0
+        z_scale = self.DEPTH_LEVELS / max(float(z.max()) - z_low, 1e-12) if len(z) else 1.0
+
+        depth = None
+        if faces and len(geometry.triangles) > 0:
+            depth = self.fill_triangles(image, geometry, x, y, z, z_low, z_scale, eye,
+                                        culling, hex_to_rgb(face_color))
+        if wireframe and len(geometry.edges) > 0:
+            bias = self.DEPTH_BIAS * self.DEPTH_LEVELS
+            if feature_angle is None:
+                edges, points = geometry.edges, slice(None)
+            else:
+                # Only the vertices of the feature edges are drawn
+                edges = geometry.feature_edges(feature_angle)
+                points = np.unique(edges)
+            self.draw_lines(image, depth, edges, x, y, z, z_low, z_scale, bias,
+                            hex_to_rgb(wireframe_color))
+            self.draw_points(image, depth, x[points], y[points], z[points], z_low, z_scale, bias,
+                             hex_to_rgb(vertex_color))
+        return image
+
+    def quantize_depth(self, z, z_low, z_scale):
+        """Depths as int64 levels in [0, DEPTH_LEVELS].
+
+        Depth is scaled in float32, where the top level rounds up to 2**31;
+        clamping keeps it from overflowing when packed into the depth buffer.
+        """
+        quantized = ((z - z_low) * z_scale).astype(np.int64)
+        return np.clip(quantized, 0, self.DEPTH_LEVELS, out=quantized)
+
+    def fill_triangles(self, image, geometry, x, y, z, z_low, z_scale, eye, culling, color):
+        """Fill the triangles into `image`; returns the (H, W) int64 depth buffer."""
+        height, width = image.shape[:2]
+        # Corner coordinates as (3, T) rows, which reduce much faster than columns
+        corners = geometry.triangles.T
+        tx, ty, tz = x[corners], y[corners], z[corners]
+
+        # Twice the signed screen area; y points down, so front faces are negative
+        area = (tx[1] - tx[0]) * (ty[2] - ty[0]) - (tx[2] - tx[0]) * (ty[1] - ty[0])
+        keep = area < 0 if culling else area != 0
+
+        # Pixel centers (i + 0.5) inside each bounding box
+        x_min = np.maximum(np.ceil(np.minimum(np.minimum(tx[0], tx[1]), tx[2]) - 0.5), 0)
+        x_max = np.minimum(np.floor(np.maximum(np.maximum(tx[0], tx[1]), tx[2]) - 0.5), width - 1)
+        y_min = np.maximum(np.ceil(np.minimum(np.minimum(ty[0], ty[1]), ty[2]) - 0.5), 0)
+        y_max = np.minimum(np.floor(np.maximum(np.maximum(ty[0], ty[1]), ty[2]) - 0.5), height - 1)
+        keep &= (x_max >= x_min) & (y_max >= y_min)
+
+        index = np.flatnonzero(keep)
+        tx, ty, tz, area = tx[:, index], ty[:, index], tz[:, index], area[index]
+        x_min, y_min = x_min[index].astype(np.int64), y_min[index].astype(np.int64)
+        box_width = x_max[index].astype(np.int64) - x_min + 1
+        counts = box_width * (y_max[index].astype(np.int64) - y_min + 1)
+
+        # Edge functions e_i = a_i * px + b_i * py + c_i, normalized so the
+        # three sum to one inside the triangle (barycentric weights)
+        a = np.empty((3, len(index)), dtype=np.float32)
+        b = np.empty((3, len(index)), dtype=np.float32)
+        c = np.empty((3, len(index)), dtype=np.float32)
+        for i in range(3):
+            j, k = (i + 1) % 3, (i + 2) % 3
+            a[i] = (ty[j] - ty[k]) / area
+            b[i] = (tx[k] - tx[j]) / area
+            c[i] = (tx[j] * ty[k] - tx[k] * ty[j]) / area
+        # Depth is the same weighted sum of the corner depths
+        depth_a = (a * tz).sum(axis=0)
+        depth_b = (b * tz).sum(axis=0)
+        depth_c = (c * tz).sum(axis=0)
+
+        buffer = np.full(height * width, -1, dtype=np.int64)
+        ends = np.cumsum(counts)
+        start = 0
+        while start < len(index):
+            end = max(int(np.searchsorted(ends, ends[start] - counts[start] + self.CHUNK_PIXELS, 'right')), start + 1)
+            chunk_counts = counts[start:end]
+            ids = np.repeat(np.arange(start, end), chunk_counts)
+            local = np.arange(len(ids)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            px = x_min[ids] + local % box_width[ids]
+            py = y_min[ids] + local // box_width[ids]
+            cx = px.astype(np.float32) + 0.5
+            cy = py.astype(np.float32) + 0.5
+
+            inside = np.ones(len(ids), dtype=bool)
+            for i in range(3):
+                inside &= a[i][ids] * cx + b[i][ids] * cy + c[i][ids] >= 0
+            ids, px, py, cx, cy = ids[inside], px[inside], py[inside], cx[inside], cy[inside]
+
+            pixel_depth = depth_a[ids] * cx + depth_b[ids] * cy + depth_c[ids]
+            quantized = self.quantize_depth(pixel_depth, z_low, z_scale)
+            np.maximum.at(buffer, py * width + px, (quantized << 32) | ids)
+            start = end
+
+        covered = buffer >= 0
+        visible = buffer[covered] & 0xFFFFFFFF
+
+        # Flat shading with a light at the camera, lit from both sides
+        normals = geometry.planes[index[visible], :3]
+        lengths = np.linalg.norm(normals, axis=1)
+        lengths[lengths == 0] = 1
+        shade = 0.35 + 0.65 * np.abs(normals @ eye.astype(np.float32)) / lengths
+        image.reshape(-1, 3)[covered] = (color * shade[:, None]).astype(np.uint8)
+        return buffer.reshape(height, width) >> 32
+
+    def draw_lines(self, image, depth, edges, x, y, z, z_low, z_scale, bias, color):
+        """Draw segments one pixel wide, skipping parts hidden behind faces."""
+        height, width = image.shape[:2]
+        ends = edges.T
+        x0, y0, z0 = x[ends[0]], y[ends[0]], z[ends[0]]
+        dx, dy, dz = x[ends[1]] - x0, y[ends[1]] - y0, z[ends[1]] - z0
+
+        # Clip to the screen (Liang-Barsky) so long segments stay cheap
+        t_low = np.zeros(len(x0), dtype=np.float32)
+        t_high = np.ones(len(x0), dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start, delta, size in ((x0, dx, width), (y0, dy, height)):
+                t_a = (0 - start) / delta
+                t_b = (size - 1e-3 - start) / delta
+                outside = np.where((start >= 0) & (start < size), np.inf, -np.inf)
+                t_low = np.fmax(t_low, np.where(delta != 0, np.minimum(t_a, t_b), -outside))
+                t_high = np.fmin(t_high, np.where(delta != 0, np.maximum(t_a, t_b), outside))
+        keep = np.flatnonzero(t_low <= t_high)
+        t_low, t_high = t_low[keep], t_high[keep]
+        dx, dy, dz = dx[keep], dy[keep], dz[keep]
+
+        # One sample per pixel along the longer screen axis
+        span = t_high - t_low
+        counts = np.ceil(np.maximum(np.abs(dx), np.abs(dy)) * span).astype(np.int64) + 1
+        step = span / np.maximum(counts - 1, 1)
+        start_x = x0[keep] + t_low * dx
+        start_y = y0[keep] + t_low * dy
+        start_z = z0[keep] + t_low * dz
+        step_x, step_y, step_z = dx * step, dy * step, dz * step
+
+        # Unclipped end samples land on the vertices, which draw_points
+        # covers, so only the samples in between are needed there
+        skip_first = (t_low == 0).astype(np.int64)
+        counts = np.maximum(counts - skip_first - (t_high == 1), 0)
+
+        flat_image = image.reshape(-1, 3)
+        flat_depth = None if depth is None else depth.ravel()
+        ends = np.cumsum(counts)
+        first = 0
+        while first < len(counts):
+            last = max(int(np.searchsorted(ends, ends[first] - counts[first] + self.CHUNK_PIXELS, 'right')), first + 1)
+            chunk_counts = counts[first:last]
+            ids = np.repeat(np.arange(first, last), chunk_counts)
+            local = (np.arange(len(ids)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+                     + skip_first[ids]).astype(np.float32)
+            px = np.clip((start_x[ids] + local * step_x[ids]).astype(np.int64), 0, width - 1)
+            py = np.clip((start_y[ids] + local * step_y[ids]).astype(np.int64), 0, height - 1)
+            pixels = py * width + px
+            if flat_depth is not None:
+                sample_depth = self.quantize_depth(start_z[ids] + local * step_z[ids], z_low, z_scale)
+                pixels = pixels[sample_depth + bias >= flat_depth[pixels]]
+            flat_image[pixels] = color
+            first = last
+
+    def draw_points(self, image, depth, x, y, z, z_low, z_scale, bias, color):
+        height, width = image.shape[:2]
+        px, py = x.astype(np.int64), y.astype(np.int64)
+        keep = (x >= 0) & (px < width) & (y >= 0) & (py < height)
+        px, py = px[keep], py[keep]
+        if depth is not None:
+            shown = self.quantize_depth(z[keep], z_low, z_scale) + bias >= depth[py, px]
+            px, py = px[shown], py[shown]
+        image[py, px] = color
+
+
+# Readers of the supported model formats, by file extension
+MESH_READERS = {'.obj': read_obj, '.ply': read_ply, '.stl': read_stl}
+
+
+class MeshCache:
+    """On-disk cache of parsed models and their render buffers.
+
+    Every entry is a directory of .npy files that later loads memory-map
+    instead of parsing the model again. Entries are keyed by the model's
+    path, size and mtime plus a hash of its contents. Once the cache grows
+    past `max_bytes` the least recently used entries are removed.
+    """
+
+    ARRAYS = ('vertices', 'face_sizes', 'face_indices', 'edges', 'triangles')
+
+    # The content hash covers the whole of small files and this many evenly
+    # spread samples of larger ones
+    HASH_SAMPLES = 64
+    HASH_SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _stat(self, filename):
+        stat = os.stat(filename)
+        return {'path': os.path.abspath(filename), 'size': stat.st_size,
+                'mtime': stat.st_mtime_ns, 'version': CACHE_VERSION}
+
+    def _content_hash(self, filename, size):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(filename, 'rb') as file:
+            if size <= self.HASH_SAMPLES * self.HASH_SAMPLE_SIZE:
+                digest.update(file.read())
+            else:
+                step = (size - self.HASH_SAMPLE_SIZE) // (self.HASH_SAMPLES - 1)
+                for sample in range(self.HASH_SAMPLES):
+                    file.seek(sample * step)
+                    digest.update(file.read(self.HASH_SAMPLE_SIZE))
+        return digest.hexdigest()
+
+    def _entry(self, meta):
+        key = hashlib.blake2b(json.dumps(meta, sort_keys=True).encode(), digest_size=16)
+        return os.path.join(self.directory, key.hexdigest())
+
+    def _meta(self, filename, vertex_dtype, weld):
+        meta = self._stat(filename)
+        meta['hash'] = self._content_hash(filename, meta['size'])
+        meta['vertex_dtype'] = np.dtype(vertex_dtype).str
+        meta['weld'] = weld
+        return meta
+
+    def load(self, filename, vertex_dtype=np.float32, weld=None):
+        """Return (vertices, faces, geometry) of a cached model, or None.
+
+        `weld` is the tolerance the model was welded with, None if it was not.
+        """
+        meta = self._meta(filename, vertex_dtype, weld)
+        entry = self._entry(meta)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as file:
+                if json.load(file) != meta:
+                    return None
+            arrays = {}
+            for name in self.ARRAYS:
+                path = os.path.join(entry, name + '.npy')
+                if os.path.exists(path):
+                    arrays[name] = np.load(path, mmap_mode='r')
+            os.utime(entry)  # Mark as recently used
+        except (OSError, ValueError):
+            return None
+
+        faces = FaceArray(arrays['face_sizes'], arrays['face_indices'])
+        geometry = RenderGeometry(arrays['vertices'], faces,
+                                  arrays['edges'], arrays.get('triangles'))
+        return arrays['vertices'], faces, geometry
+
+    def store(self, filename, vertices, faces, geometry, weld=None):
+        """Write a parsed model to the cache, then evict old entries."""
+        meta = self._meta(filename, vertices.dtype, weld)
+        entry = self._entry(meta)
+        arrays = {'vertices': vertices, 'face_sizes': faces.sizes,
+                  'face_indices': faces.indices, 'edges': geometry.edges}
+        # Triangle meshes are their own triangulation
+        if geometry.triangles is not faces.uniform:
+            arrays['triangles'] = geometry.triangles
+        if sum(array.nbytes for array in arrays.values()) > self.max_bytes:
+            return
+
+        # Write next to the final location and rename, so a crash or a
+        # concurrent load never sees a half written entry
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(temporary, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(temporary, name + '.npy'), np.ascontiguousarray(array))
+            with open(os.path.join(temporary, 'meta.json'), 'w') as file:
+                json.dump(meta, file)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(temporary, entry)
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its cap."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp') or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class LoadCancelled(Exception):
+    """Raised from a progress callback to abort loading a model."""
+
+
+def check_cancelled(cancelled):
+    """Raise LoadCancelled once the threading.Event `cancelled` is set."""
+    if cancelled is not None and cancelled.is_set():
+        raise LoadCancelled()
+
+
+def load_mesh(filename, progress=None, cache=None, vertex_dtype=np.float32, workers=1,
+              weld=None, weld_tolerance=0.0, timer=None, cancelled=None):
+    """Read a model file and build everything the viewer needs to show it.
+
+    Returns (vertices, faces, geometry). Does not touch Tk, so it can run on
+    a worker thread. With a MeshCache, a cached copy of the model is used
+    when there is one and a freshly parsed model is added to it.
+    `vertex_dtype` may be np.float16 to halve vertex memory for display,
+    and `workers` > 1 parses large text files on that many processes.
+    Duplicate vertices are welded (see weld_vertices) when `weld` is true,
+    or for the WELD_FORMATS when it is None. A PhaseTimer passed as `timer`
+    gets the time of every step. Setting the threading.Event `cancelled`
+    stops the load with LoadCancelled before its next step, and a
+    cancelled load is never stored in the cache.
+    """
+    timer = timer if timer is not None else PhaseTimer()
+    extension = os.path.splitext(filename)[1].lower()
+    reader = MESH_READERS.get(extension)
+    if reader is None:
+        raise Exception("Unsupported file format")
+    if weld is None:
+        weld = extension in WELD_FORMATS
+    weld = float(weld_tolerance) if weld else None
+
+    if cache is not None:
+        with timer.phase('cache'):
+            cached = cache.load(filename, vertex_dtype, weld)
+        if cached is not None:
+            return cached
+
+    with timer.phase('parse'):
+        vertices, face_sizes, face_indices = reader(filename, progress, vertex_dtype, workers)
+    check_cancelled(cancelled)
+    if len(vertices) == 0:
+        raise Exception("No vertices found in file")
+    if not np.isfinite(vertices).all():
+        raise Exception("Model coordinates do not fit the selected vertex precision")
+    if weld is not None:
+        with timer.phase('weld'):
+            vertices, face_indices = weld_vertices(vertices, face_indices, weld)
+        check_cancelled(cancelled)
+
+    faces = FaceArray(face_sizes, face_indices)
+    with timer.phase('edges'):
+        edges = faces.unique_edges()
+    check_cancelled(cancelled)
+    with timer.phase('triangulate'):
+        triangles = faces.triangulate()
+    check_cancelled(cancelled)
+    geometry = RenderGeometry(vertices, faces, edges, triangles)
+
+    if cache is not None:
+        try:
+            with timer.phase('cache'):
+                cache.store(filename, vertices, faces, geometry, weld)
+        except OSError:
+            pass  # The cache is only an optimization
+    return vertices, faces, geometry
+
+
+def setup_model_axes(ax, bounds, background_color):
+    """Style a cleared 3D axes and fit its limits to a model's bounding box."""
+    ax.set_facecolor(background_color)
+
+    # Hide background panels of the 3D box
+    ax.xaxis.pane.fill = False
+    ax.yaxis.pane.fill = False
+    ax.zaxis.pane.fill = False
+
+    ax.xaxis.pane.set_edgecolor('none')
+    ax.yaxis.pane.set_edgecolor('none')
+    ax.zaxis.pane.set_edgecolor('none')
+
+    # Auto-scale plot limits based on model's bounding box
+    min_coords, max_coords = bounds
+
+    max_range = np.max(max_coords - min_coords) / 2.0
+
+    mid_x = (max_coords[0] + min_coords[0]) * 0.5
+    mid_y = (max_coords[1] + min_coords[1]) * 0.5
+    mid_z = (max_coords[2] + min_coords[2]) * 0.5
+
+    # Set limits with a small buffer for better visualization
+    buffer = max_range * 0.1
+    ax.set_xlim(mid_x - max_range - buffer, mid_x + max_range + buffer)
+    ax.set_ylim(mid_y - max_range - buffer, mid_y + max_range + buffer)
+    ax.set_zlim(mid_z - max_range - buffer, mid_z + max_range + buffer)
+
+    ax.tick_params(colors='white') # Ensure tick colors remain white
+
+
+def make_face_collection(geometry, color, culling=False):
+    # Use a single Poly3DCollection for all triangles
+    import_matplotlib()
+    return CulledPoly3DCollection(geometry, alpha=0.5, facecolor=color,
+                                  edgecolors='none', culling=culling)
+
+
+def make_wire_collection(geometry, color, feature_angle=None):
+    import_matplotlib()
+    return FeatureLine3DCollection(geometry, colors=color, linewidths=1,
+                                   feature_angle=feature_angle)
+
+
+class RecentModels:
+    """In-memory LRU of loaded models, kept to switch between them instantly.
+
+    Every entry holds the (vertices, faces, geometry) of a model together
+    with a signature of the file and load options it was built from. The
+    least recently used models are dropped while their total size is over
+    `max_bytes`; the most recent one is always kept.
+    """
+
+    def __init__(self, max_bytes=RECENT_MODELS_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def filenames(self):
+        """Filenames of the kept models, most recently used first."""
+        return list(reversed(self.entries))
+
+    def get(self, filename, signature=None):
+        """Return a kept model and mark it as used, or None.
+
+        With a signature, only a model built the same way is returned.
+        """
+        entry = self.entries.get(filename)
+        if entry is None or (signature is not None and entry[0] != signature):
+            return None
+        self.entries.move_to_end(filename)
+        return entry[1]
+
+    def add(self, filename, signature, model):
+        self.entries[filename] = (signature, model)
+        self.entries.move_to_end(filename)
+        self.evict()
+
+    def nbytes(self, filename):
+        return model_nbytes(*self.entries[filename][1])
+
+    def evict(self):
+        """Drop the least recently used models until the budget is met.
+
+        Sizes are measured now, as render buffers are added to a model the
+        first time it is drawn.
+        """
+        sizes = {filename: self.nbytes(filename) for filename in self.entries}
+        total = sum(sizes.values())
+        while total > self.max_bytes and len(self.entries) > 1:
+            filename, _ = self.entries.popitem(last=False)
+            total -= sizes[filename]
+
+
+class LoadJob:
+    """Loads a model with load_mesh on a background thread.
+
+    The Tk thread polls `progress` (0 to 1) and `done`, then reads `result`
+    or `error`. cancel() makes the worker stop at its next progress report.
+    Keyword arguments (cache, vertex_dtype...) are passed on to load_mesh,
+    and `timer` holds the time of every step once the job is done.
+    """
+
+    def __init__(self, filename, **options):
+        self.filename = filename
+        self.options = options
+        self.timer = PhaseTimer()
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.done = False
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _report(self, done, total):
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+        self.progress = done / total if total else 1.0
+
+    def _run(self):
+        try:
+            vertices, faces, geometry = load_mesh(self.filename, self._report, timer=self.timer,
+                                                  cancelled=self._cancelled, **self.options)
+            with self.timer.phase('levels'):
+                geometry.build_levels()
+            check_cancelled(self._cancelled)
+            with self.timer.phase('index'):
+                geometry.build_pick_index()
+            check_cancelled(self._cancelled)
+            self.result = vertices, faces, geometry
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
 
 class WireframeViewer:
     def __init__(self, root):
@@ -18,8 +1961,49 @@ class WireframeViewer:
         # Variables for the model
         self.vertices = None
         self.faces = None
+        self.geometry = None
         self.model_loaded = False
         self.current_file = ""
+        self.load_job = None
+        self.mesh_cache = MeshCache()
+        self.recent_models = RecentModels()
+
+        # Artists of the current scene, kept alive between redraws
+        self.scene_geometry = None
+        self.mesh_collection = None
+        self.wire_collection = None
+
+        # Coarser level of detail shown while the view is being dragged
+        self.interacting = False
+        self.idle_timer = None
+        self.lod_geometry = None
+        self.lod_mesh_collection = None
+        self.lod_wire_collection = None
+
+        # Vertex or edge picked by a click and the one under the cursor, as
+        # ('vertex' or 'edge', index), and the artist highlighting the pick
+        self.picked = None
+        self.hovered = None
+        self.pick_artist = None
+        self.press_position = None
+
+        # Software viewport, an alternative to the matplotlib canvas
+        self.software_renderer = SoftwareRenderer()
+        self.software_image = None
+        self.software_zoom = 1.0
+        self.drag_start = None
+
+        # Redraw scheduler: parts of the scene that changed since the last
+        # frame, and whether a redraw is already waiting for Tk to be idle
+        self.dirty = set()
+        self.redraw_pending = False
+
+        # Phase timings of the last load and recent frames
+        self.frame_timer = PhaseTimer()
+        self.frame_times = collections.deque(maxlen=FRAME_HISTORY)
+        self.load_phases = {}
+        self.last_frame = None
+        self.profile_log = os.environ.get(PROFILE_LOG_ENV)
 
         # Color variables
         self.wireframe_color = '#00ffff'  # Cyan
@@ -30,9 +2014,21 @@ class WireframeViewer:
         # Display control variables
         self.wireframe_var = tk.BooleanVar(value=True) # Controls if wireframe is visible
         self.show_faces_var = tk.BooleanVar(value=False) # New: Controls if filled faces are visible
-
+        self.use_cache_var = tk.BooleanVar(value=True) # Reuse parsed models from the mesh cache
+        self.compact_vertices_var = tk.BooleanVar(value=False) # Store vertices as float16
+        self.parallel_parse_var = tk.BooleanVar(value=True) # Parse large text files on all cores
+        self.weld_vertices_var = tk.BooleanVar(value=True) # Merge the duplicate vertices of STL files
+        self.cull_faces_var = tk.BooleanVar(value=False) # Skip faces pointing away from the camera
+        self.feature_edges_var = tk.BooleanVar(value=False) # Draw only boundary and sharp edges
+        self.feature_angle_var = tk.IntVar(value=FEATURE_ANGLE) # Degrees above which an edge is sharp
+        self.show_hud_var = tk.BooleanVar(value=False) # Overlay of load and frame timings
+        self.backend_var = tk.StringVar(value='matplotlib') # Viewport drawing the model
+        self.lod_budget_var = tk.IntVar(value=LOD_BUDGET // 1000) # Thousands of primitives drawn while dragging
+
+        # The window is painted before matplotlib is imported for the plot
+        self.fig = None
         self.setup_ui()
-        self.setup_3d_plot()
+        self.expose_binding = self.root.bind('<Expose>', self.first_paint, add='+')
 
     def setup_ui(self):
         # Main frame
@@ -71,7 +2067,60 @@ class WireframeViewer:
         self.status_label = tk.Label(import_frame, text="No model loaded",
                                          bg='#3f3f46', fg='#cccccc',
                                          font=('Segoe UI', 9))
-        self.status_label.pack(padx=10, pady=(0, 10))
+        self.status_label.pack(padx=10, pady=(0, 5))
+
+        # Progress of a model loading in the background
+        progress_frame = tk.Frame(import_frame, bg='#3f3f46')
+        progress_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        self.btn_cancel = tk.Button(progress_frame, text="Cancel",
+                                         bg='#6c757d', fg='white',
+                                         font=('Segoe UI', 9),
+                                         command=self.cancel_load,
+                                         cursor='hand2', state='disabled')
+        self.btn_cancel.pack(side=tk.RIGHT, padx=(5, 0))
+
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        # Checkbox for the on-disk mesh cache
+        cache_check = tk.Checkbutton(import_frame, text="Use Mesh Cache",
+                                         variable=self.use_cache_var,
+                                         bg='#3f3f46', fg='white',
+                                         selectcolor='#3f3f46')
+        cache_check.pack(padx=10)
+
+        # Checkbox for half precision vertices on very large models
+        compact_check = tk.Checkbutton(import_frame, text="Compact Vertices (float16)",
+                                         variable=self.compact_vertices_var,
+                                         bg='#3f3f46', fg='white',
+                                         selectcolor='#3f3f46')
+        compact_check.pack(padx=10)
+
+        # Checkbox for parsing large OBJ and ASCII PLY files on all cores
+        parallel_check = tk.Checkbutton(import_frame, text="Parallel Parsing",
+                                          variable=self.parallel_parse_var,
+                                          bg='#3f3f46', fg='white',
+                                          selectcolor='#3f3f46')
+        parallel_check.pack(padx=10)
+
+        # Checkbox for welding the separate triangle corners of STL files
+        weld_check = tk.Checkbutton(import_frame, text="Weld STL Vertices",
+                                      variable=self.weld_vertices_var,
+                                      bg='#3f3f46', fg='white',
+                                      selectcolor='#3f3f46')
+        weld_check.pack(padx=10)
+
+        # Models kept in memory, most recent first; selecting one shows it
+        tk.Label(import_frame, text="Recent Models:",
+                 bg='#3f3f46', fg='white', font=('Segoe UI', 9)).pack(anchor=tk.W, padx=10)
+        self.recent_list = tk.Listbox(import_frame, height=4,
+                                      bg='#2d2d30', fg='white',
+                                      selectbackground='#007acc',
+                                      highlightthickness=0, activestyle='none',
+                                      font=('Segoe UI', 9))
+        self.recent_list.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.recent_list.bind('<<ListboxSelect>>', self.switch_recent_model)
 
         # Color controls section
         color_frame = tk.LabelFrame(control_frame, text="Color Controls",
@@ -182,17 +2231,72 @@ class WireframeViewer:
                                          variable=self.wireframe_var,
                                          bg='#3f3f46', fg='white',
                                          selectcolor='#3f3f46',
-                                         command=self.update_plot)
+                                         command=self.toggle_visibility)
         wireframe_check.pack(padx=10, pady=5)
 
+        # Checkbox and slider for the feature edge mode of the wireframe
+        features_check = tk.Checkbutton(render_frame, text="Feature Edges Only",
+                                         variable=self.feature_edges_var,
+                                         bg='#3f3f46', fg='white',
+                                         selectcolor='#3f3f46',
+                                         command=self.toggle_visibility)
+        features_check.pack(padx=10, pady=5)
+
+        feature_scale = tk.Scale(render_frame, label="Feature Angle (degrees)",
+                                         from_=0, to=180, orient=tk.HORIZONTAL,
+                                         variable=self.feature_angle_var,
+                                         bg='#3f3f46', fg='white',
+                                         highlightthickness=0,
+                                         font=('Segoe UI', 9),
+                                         command=self.change_feature_angle)
+        feature_scale.pack(fill=tk.X, padx=10, pady=5)
+
         # New: Checkbox to show faces
         faces_check = tk.Checkbutton(render_frame, text="Show Faces",
                                          variable=self.show_faces_var,
                                          bg='#3f3f46', fg='white',
                                          selectcolor='#3f3f46',
-                                         command=self.update_plot)
+                                         command=self.toggle_visibility)
         faces_check.pack(padx=10, pady=5)
 
+        # Checkbox for back-face culling of the faces
+        cull_check = tk.Checkbutton(render_frame, text="Cull Back Faces",
+                                         variable=self.cull_faces_var,
+                                         bg='#3f3f46', fg='white',
+                                         selectcolor='#3f3f46',
+                                         command=self.toggle_culling)
+        cull_check.pack(padx=10, pady=5)
+
+        # Checkbox for the performance overlay on the viewport
+        hud_check = tk.Checkbutton(render_frame, text="Performance HUD",
+                                         variable=self.show_hud_var,
+                                         bg='#3f3f46', fg='white',
+                                         selectcolor='#3f3f46',
+                                         command=self.toggle_hud)
+        hud_check.pack(padx=10, pady=5)
+
+        # Viewport backend selection
+        backend_frame = tk.Frame(render_frame, bg='#3f3f46')
+        backend_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(backend_frame, text="Viewport:",
+                 bg='#3f3f46', fg='white', font=('Segoe UI', 9)).pack(side=tk.LEFT)
+        for text, value in (("Matplotlib", 'matplotlib'), ("Software", 'software')):
+            tk.Radiobutton(backend_frame, text=text, value=value,
+                           variable=self.backend_var,
+                           bg='#3f3f46', fg='white',
+                           selectcolor='#3f3f46',
+                           command=self.change_backend).pack(side=tk.LEFT)
+
+        # Slider for the level of detail budget used while dragging
+        lod_scale = tk.Scale(render_frame, label="Drag Detail (k primitives)",
+                                         from_=1, to=500, orient=tk.HORIZONTAL,
+                                         variable=self.lod_budget_var,
+                                         bg='#3f3f46', fg='white',
+                                         highlightthickness=0,
+                                         font=('Segoe UI', 9))
+        lod_scale.pack(fill=tk.X, padx=10, pady=5)
+
         # Render button
         self.btn_render = tk.Button(render_frame, text="Take Render",
                                          bg='#17a2b8', fg='white',
@@ -213,6 +2317,35 @@ class WireframeViewer:
         self.plot_frame = tk.Frame(main_frame, bg='black')
         self.plot_frame.grid(row=0, column=1, sticky="nsew")
 
+        # Shown until the plot is created
+        self.placeholder_label = tk.Label(self.plot_frame, text="Starting viewer...",
+                                          bg='black', fg='white', font=('Segoe UI', 12))
+        self.placeholder_label.pack(expand=True)
+
+    def first_paint(self, event=None):
+        """Create the plot once the window has been painted.
+
+        Widgets repaint from idle callbacks queued by their Expose events,
+        so the remaining events and repaints are flushed first; the slow
+        matplotlib import then starts from a timer, on a window that is
+        already drawn.
+        """
+        self.root.unbind('<Expose>', self.expose_binding)
+        self.root.update()
+        self.root.after(1, self.finish_startup, time.perf_counter())
+
+    def finish_startup(self, painted):
+        self.ensure_plot()
+        self.log_profile({'event': 'startup', 'first_paint': painted - STARTED,
+                          'plot_ready': time.perf_counter() - STARTED})
+
+    def ensure_plot(self):
+        """Create the figure and canvases if that has not happened yet."""
+        if self.fig is None:
+            import_matplotlib()
+            self.placeholder_label.destroy()
+            self.setup_3d_plot()
+
     def setup_3d_plot(self):
         self.fig = Figure(figsize=(8, 6), facecolor=self.background_color)
         self.ax = self.fig.add_subplot(111, projection='3d')
@@ -235,21 +2368,58 @@ class WireframeViewer:
         self.ax.tick_params(colors='white')
         self.fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
-        self.canvas = FigureCanvasTkAgg(self.fig, self.plot_frame)
+        self.canvas = TimedFigureCanvas(self.fig, self.plot_frame)
+        self.canvas.on_draw = self.frame_drawn
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-        toolbar = tk.Frame(self.plot_frame, bg='#2d2d30')
-        toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        # Show a coarser level of detail while the view is rotated or zoomed,
+        # from the moment a press starts dragging so plain clicks keep full
+        # detail
+        self.canvas.mpl_connect('button_press_event', self.press_view)
+        self.canvas.mpl_connect('motion_notify_event', self.start_interaction)
+        self.canvas.mpl_connect('button_release_event', self.schedule_full_detail)
+
+        # Clicking picks the vertex or edge under the cursor, hovering reads it out
+        self.canvas.mpl_connect('button_release_event', self.click_pick)
+        self.canvas.mpl_connect('motion_notify_event', self.hover_pick)
+
+        self.toolbar = tk.Frame(self.plot_frame, bg='#2d2d30')
+        self.toolbar.pack(side=tk.BOTTOM, fill=tk.X)
 
         from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
-        nav_toolbar = NavigationToolbar2Tk(self.canvas, toolbar)
+        nav_toolbar = NavigationToolbar2Tk(self.canvas, self.toolbar)
         nav_toolbar.configure(bg='#2d2d30')
         nav_toolbar.update()
 
+        # Canvas of the software viewport, packed in place of the matplotlib
+        # canvas while that backend is selected
+        self.software_canvas = tk.Canvas(self.plot_frame, bg=self.background_color,
+                                         highlightthickness=0)
+        self.software_canvas.bind('<ButtonPress-1>', self.software_press)
+        self.software_canvas.bind('<B1-Motion>', self.software_drag)
+        self.software_canvas.bind('<ButtonRelease-1>', self.click_pick)
+        self.software_canvas.bind('<Motion>', self.hover_pick)
+        self.software_canvas.bind('<MouseWheel>', self.software_wheel)
+        self.software_canvas.bind('<Button-4>', self.software_wheel)
+        self.software_canvas.bind('<Button-5>', self.software_wheel)
+        self.software_canvas.bind('<Configure>', lambda event: self.request_redraw('camera'))
+
+        # Performance overlay, placed over the viewport while enabled
+        self.performance_hud = tk.Label(self.plot_frame, bg='#1e1e1e', fg='#00ff00',
+                                        font=('Consolas', 9), justify=tk.LEFT)
+
         self.show_initial_message()
 
     def show_initial_message(self):
+        self.scene_geometry = None
+        self.picked = self.hovered = self.pick_artist = None
+        self.mesh_collection = None
+        self.wire_collection = None
+        self.lod_geometry = None
+        self.lod_mesh_collection = None
+        self.lod_wire_collection = None
+
         self.ax.clear()
         self.ax.set_facecolor(self.background_color)
 
@@ -277,30 +2447,28 @@ class WireframeViewer:
         if color[1]:
             self.wireframe_color = color[1]
             self.wireframe_color_btn.config(bg=self.wireframe_color)
-            self.update_plot()
+            self.apply_colors()
 
     def change_vertex_color(self):
         color = colorchooser.askcolor(color=self.vertex_color, title="Select color for vertices")
         if color[1]:
             self.vertex_color = color[1]
             self.vertex_color_btn.config(bg=self.vertex_color)
-            self.update_plot()
+            self.apply_colors()
 
     def change_face_color(self):
         color = colorchooser.askcolor(color=self.face_color, title="Select color for faces")
         if color[1]:
             self.face_color = color[1]
             self.face_color_btn.config(bg=self.face_color)
-            self.update_plot()
+            self.apply_colors()
 
     def change_background_color(self):
         color = colorchooser.askcolor(color=self.background_color, title="Select background color")
         if color[1]:
             self.background_color = color[1]
             self.bg_color_btn.config(bg=self.background_color)
-            self.fig.patch.set_facecolor(self.background_color)
-            self.ax.set_facecolor(self.background_color)
-            self.update_plot()
+            self.apply_colors()
 
     def reset_colors(self):
         self.wireframe_color = '#00ffff'
@@ -313,10 +2481,24 @@ class WireframeViewer:
         self.face_color_btn.config(bg=self.face_color)
         self.bg_color_btn.config(bg=self.background_color)
 
+        self.apply_colors()
+
+    def apply_colors(self):
+        self.request_redraw('colors')
+
+    def recolor_scene(self):
+        """Recolor the existing artists without rebuilding them."""
         self.fig.patch.set_facecolor(self.background_color)
         self.ax.set_facecolor(self.background_color)
-
-        self.update_plot()
+        if self.mesh_collection is not None:
+            self.mesh_collection.set_facecolor(self.face_color)
+        if self.wire_collection is not None:
+            self.wire_collection.set_color(self.wireframe_color)
+        if self.lod_mesh_collection is not None:
+            self.lod_mesh_collection.set_facecolor(self.face_color)
+        if self.lod_wire_collection is not None:
+            self.lod_wire_collection.set_color(self.wireframe_color)
+        self.software_canvas.config(bg=self.background_color)
 
     def import_mesh(self):
         file_types = [
@@ -332,227 +2514,549 @@ class WireframeViewer:
         )
 
         if filename:
-            try:
-                self.load_model(filename)
-                self.current_file = filename
-                self.status_label.config(text=f"Loaded: {os.path.basename(filename)}")
-                self.model_loaded = True
-                self.enable_buttons()
-                self.update_plot()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not load model:\n{str(e)}")
-                self.status_label.config(text="Error loading model")
-
-    def load_model(self, filename):
-        vertices = []
-        faces = []
-
-        if filename.lower().endswith('.obj'):
-            with open(filename, 'r') as file:
-                for line in file:
-                    if line.startswith('v '):
-                        parts = line.strip().split()
-                        x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-                        vertices.append([x, y, z])
-                    elif line.startswith('f '):
-                        parts = line.strip().split()
-                        face = []
-                        for part in parts[1:]:
-                            vertex_idx = int(part.split('/')[0]) - 1
-                            face.append(vertex_idx)
-                        faces.append(face)
-
-        elif filename.lower().endswith('.ply'):
-            self.load_ply(filename, vertices, faces)
-        elif filename.lower().endswith('.stl'):
-            self.load_stl(filename, vertices, faces)
-        else:
-            raise Exception("Unsupported file format")
-
-        self.vertices = np.array(vertices)
-        self.faces = faces
-
-        if len(vertices) == 0:
-            raise Exception("No vertices found in file")
-
-    def load_ply(self, filename, vertices, faces):
-        with open(filename, 'r') as file:
-            vertex_count = 0
-            face_count = 0
-            reading_vertices = False
-            reading_faces = False
-
-            for line in file:
-                if line.startswith('element vertex'):
-                    vertex_count = int(line.split()[-1])
-                elif line.startswith('element face'):
-                    face_count = int(line.split()[-1])
-                elif line.startswith('end_header'):
-                    reading_vertices = True
-                    continue
+            # A new import replaces one that is still running
+            self.stop_load()
+
+            # Models still in memory from earlier need no loading at all
+            options = self.load_options()
+            model = self.recent_models.get(filename, self.model_signature(filename, options))
+            if model is not None:
+                self.load_phases = {}
+                self.show_model(filename, model)
+                return
+
+            self.load_job = LoadJob(filename, **options)
+            self.status_label.config(text=f"Loading: {os.path.basename(filename)}")
+            self.progress_bar['value'] = 0
+            self.btn_cancel.config(state='normal')
+            self.root.after(LOAD_POLL_MS, self.poll_load_job, self.load_job)
+
+    def poll_load_job(self, job):
+        if job is not self.load_job:
+            return  # Cancelled or replaced by a newer import
+
+        self.progress_bar['value'] = job.progress * 100
+        if not job.done:
+            self.root.after(LOAD_POLL_MS, self.poll_load_job, job)
+            return
+
+        self.load_job = None
+        self.btn_cancel.config(state='disabled')
+
+        if job.error is not None:
+            self.progress_bar['value'] = 0
+            messagebox.showerror("Error", f"Could not load model:\n{str(job.error)}")
+            self.status_label.config(text="Error loading model")
+            return
 
-                if reading_vertices and len(vertices) < vertex_count:
-                    parts = line.strip().split()
-                    if len(parts) >= 3:
-                        vertices.append([float(parts[0]), float(parts[1]), float(parts[2])])
-                elif len(vertices) == vertex_count and not reading_faces:
-                    reading_faces = True
-                    reading_vertices = False
-
-                if reading_faces and len(faces) < face_count:
-                    parts = line.strip().split()
-                    if len(parts) > 1:
-                        num_vertices = int(parts[0])
-                        face = [int(parts[i+1]) for i in range(num_vertices)]
-                        faces.append(face)
-
-    def load_stl(self, filename, vertices, faces):
-        with open(filename, 'r') as file:
-            vertex_buffer = []
-            for line in file:
-                if 'vertex' in line:
-                    parts = line.strip().split()
-                    if len(parts) >= 4:
-                        vertex = [float(parts[1]), float(parts[2]), float(parts[3])]
-                        vertex_buffer.append(vertex)
-
-                        if len(vertex_buffer) == 3:
-                            start_idx = len(vertices)
-                            vertices.extend(vertex_buffer)
-                            faces.append([start_idx, start_idx + 1, start_idx + 2])
-                            vertex_buffer = []
+        self.recent_models.add(job.filename, self.model_signature(job.filename, job.options),
+                               job.result)
+        self.show_model(job.filename, job.result)
+        self.record_load(job.filename, job.timer.take())
+
+    def show_model(self, filename, model):
+        """Make a loaded model the current one and draw it."""
+        self.vertices, self.faces, self.geometry = model
+        self.current_file = filename
+        self.status_label.config(text=f"Loaded: {os.path.basename(filename)}")
+        self.progress_bar['value'] = 100
+        self.model_loaded = True
+        self.enable_buttons()
+        self.refresh_recent_list()
+        self.request_redraw('geometry')
+
+    def model_signature(self, filename, options):
+        """The file state and load options a loaded model depends on."""
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size,
+                np.dtype(options['vertex_dtype']).str, options['weld'])
+
+    def refresh_recent_list(self):
+        self.recent_models.evict()
+        self.recent_list.delete(0, tk.END)
+        for filename in self.recent_models.filenames():
+            size = self.recent_models.nbytes(filename) / 2**20
+            self.recent_list.insert(tk.END, f"{os.path.basename(filename)}  ({size:.0f} MB)")
+
+    def switch_recent_model(self, event=None):
+        selection = self.recent_list.curselection()
+        if not selection:
+            return
+        filename = self.recent_models.filenames()[selection[0]]
+        if filename != self.current_file or self.load_job is not None:
+            # Switching models replaces a load that is still running
+            self.stop_load()
+            self.load_phases = {}
+            self.show_model(filename, self.recent_models.get(filename))
+
+    def stop_load(self):
+        """Cancel the load running in the background, if there is one."""
+        if self.load_job is None:
+            return False
+        self.load_job.cancel()
+        self.load_job = None
+        self.btn_cancel.config(state='disabled')
+        return True
+
+    def cancel_load(self):
+        if self.stop_load():
+            self.progress_bar['value'] = 0
+            self.status_label.config(text="Loading cancelled")
+
+    def load_options(self):
+        """load_mesh keyword arguments for the import options of the panel."""
+        return {
+            'cache': self.mesh_cache if self.use_cache_var.get() else None,
+            'vertex_dtype': np.float16 if self.compact_vertices_var.get() else np.float32,
+            'workers': (os.cpu_count() or 1) if self.parallel_parse_var.get() else 1,
+            'weld': None if self.weld_vertices_var.get() else False,
+        }
 
     def enable_buttons(self):
         for btn in self.view_buttons:
             btn.config(state='normal')
         self.btn_render.config(state='normal')
 
-    def get_unique_edges(self, faces):
-        """Helper to extract unique edges from faces."""
-        edges = set()
-        for face in faces:
-            # Ensure face has at least 2 vertices to form an edge
-            if len(face) < 2:
-                continue
-            for i in range(len(face)):
-                v1_idx = face[i]
-                v2_idx = face[(i + 1) % len(face)]
-                # Ensure a consistent order for the edge (e.g., smaller index first)
-                edge = tuple(sorted((v1_idx, v2_idx)))
-                edges.add(edge)
-        return list(edges) # Convert to list for iteration or direct processing
-
-    def update_plot(self):
-        if not self.model_loaded or self.vertices is None:
+    def request_redraw(self, *reasons):
+        """Mark parts of the scene dirty and redraw once Tk is idle.
+
+        Reasons are 'geometry' (new model or viewport), 'visibility' (layers,
+        level of detail, culling), 'colors', 'camera' and 'pick'. Every
+        request made before the redraw runs is served by the same single
+        frame.
+        """
+        self.dirty.update(reasons)
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.root.after_idle(self.redraw)
+
+    def redraw(self):
+        """Do only the work the accumulated dirty flags need, then draw."""
+        self.redraw_pending = False
+        dirty, self.dirty = self.dirty, set()
+        if not dirty:
+            return
+        self.ensure_plot()
+        software = self.backend_var.get() == 'software'
+
+        if not self.model_loaded or self.geometry is None:
             self.show_initial_message()
+            if software:
+                self.draw_software()
             return
 
-        self.ax.clear()
-        self.ax.set_facecolor(self.background_color)
+        if self.scene_geometry is not self.geometry:
+            with self.frame_timer.phase('scene'):
+                self.build_scene()
+            dirty.add('geometry')
+        if 'colors' in dirty:
+            with self.frame_timer.phase('colors'):
+                self.recolor_scene()
+        if software:
+            self.draw_software()
+            return
+        if dirty & {'geometry', 'visibility'}:
+            with self.frame_timer.phase('artists'):
+                self.sync_scene()
 
-        # Hide background panels of the 3D box
-        self.ax.xaxis.pane.fill = False
-        self.ax.yaxis.pane.fill = False
-        self.ax.zaxis.pane.fill = False
+        self.canvas.draw()
 
-        self.ax.xaxis.pane.set_edgecolor('none')
-        self.ax.yaxis.pane.set_edgecolor('none')
-        self.ax.zaxis.pane.set_edgecolor('none')
+    def change_backend(self):
+        self.ensure_plot()
+        if self.backend_var.get() == 'software':
+            self.canvas.get_tk_widget().pack_forget()
+            self.toolbar.pack_forget()
+            self.software_canvas.pack(fill=tk.BOTH, expand=True)
+        else:
+            self.software_canvas.pack_forget()
+            self.toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+            self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.request_redraw('geometry')
+
+    def draw_software(self):
+        """Rasterize the model with the software renderer and show it."""
+        if self.backend_var.get() != 'software':
+            return
 
-        # --- Rendering Logic ---
-
-        # 1. Draw Filled Faces (if show_faces_var is True)
-        if self.show_faces_var.get() and self.faces is not None and len(self.faces) > 0:
-            all_triangles = []
-            for face in self.faces:
-                if len(face) >= 3:
-                    if len(face) == 3:
-                        all_triangles.append(self.vertices[face])
-                    elif len(face) > 3:
-                        # Triangulate N-gon (simple fan triangulation from the first vertex)
-                        for i in range(1, len(face) - 1):
-                            tri_indices = [face[0], face[i], face[i+1]]
-                            all_triangles.append(self.vertices[tri_indices])
-
-            if all_triangles:
-                # Use a single Poly3DCollection for all triangles
-                mesh = Poly3DCollection(all_triangles, alpha=0.5, facecolor=self.face_color, edgecolors='none')
-                self.ax.add_collection3d(mesh)
-
-        # 2. Draw Wireframe (if wireframe_var is True)
-        if self.wireframe_var.get() and self.faces is not None and len(self.faces) > 0:
-            unique_edges = self.get_unique_edges(self.faces)
-            edge_coords = []
-            for v1_idx, v2_idx in unique_edges:
-                edge_coords.append([self.vertices[v1_idx], self.vertices[v2_idx]])
-
-            if edge_coords:
-                lines = Line3DCollection(edge_coords, colors=self.wireframe_color, linewidths=1)
-                self.ax.add_collection(lines)
-
-
-        # --- Axis and Visibility Configuration ---
-        if self.model_loaded and self.vertices is not None and len(self.vertices) > 0:
-            # Auto-scale plot limits based on model's bounding box
-            min_coords = self.vertices.min(axis=0)
-            max_coords = self.vertices.max(axis=0)
-
-            max_range = np.max(max_coords - min_coords) / 2.0
-
-            mid_x = (max_coords[0] + min_coords[0]) * 0.5
-            mid_y = (max_coords[1] + min_coords[1]) * 0.5
-            mid_z = (max_coords[2] + min_coords[2]) * 0.5
-
-            # Set limits with a small buffer for better visualization
-            buffer = max_range * 0.1
-            self.ax.set_xlim(mid_x - max_range - buffer, mid_x + max_range + buffer)
-            self.ax.set_ylim(mid_y - max_range - buffer, mid_y + max_range + buffer)
-            self.ax.set_zlim(mid_z - max_range - buffer, mid_z + max_range + buffer)
-        else: # If no model is loaded, revert to default limits for the message
-            self.ax.set_xlim(-1, 1)
-            self.ax.set_ylim(-1, 1)
-            self.ax.set_zlim(-1, 1)
-            self.ax.set_xticks([])
-            self.ax.set_yticks([])
-            self.ax.set_zticks([])
-
-
-        self.ax.tick_params(colors='white') # Ensure tick colors remain white
+        canvas = self.software_canvas
+        width, height = max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1)
+        canvas.delete('all')
+        if not self.model_loaded or self.geometry is None:
+            self.software_image = None
+            canvas.create_text(width / 2, height / 2, text='Import a 3D model to begin',
+                               fill='white', font=('Segoe UI', 16))
+            return
 
-        self.canvas.draw()
+        # The camera is shared with the matplotlib axes, so presets and
+        # renders use the same view
+        with self.frame_timer.phase('rasterize'):
+            image = self.software_renderer.render(
+                self.geometry, width, height, self.ax.elev, self.ax.azim, self.software_zoom,
+                wireframe=self.wireframe_var.get(), faces=self.show_faces_var.get(),
+                culling=self.cull_faces_var.get(), wireframe_color=self.wireframe_color,
+                vertex_color=self.vertex_color, face_color=self.face_color,
+                background_color=self.background_color, feature_angle=self.feature_angle())
+        with self.frame_timer.phase('blit'):
+            header = f"P6 {width} {height} 255\n".encode()
+            self.software_image = tk.PhotoImage(width=width, height=height,
+                                                data=header + image.tobytes(), format='PPM')
+            canvas.create_image(0, 0, image=self.software_image, anchor=tk.NW)
+            self.draw_pick_overlay()
+        self.record_frame(self.frame_timer.take())
+
+    def frame_drawn(self, seconds):
+        """Called by the matplotlib canvas after every draw."""
+        phases = self.frame_timer.take()
+        phases['draw'] = seconds
+        self.record_frame(phases)
+
+    def model_stats(self):
+        if self.geometry is None:
+            return {'vertices': 0, 'faces': 0, 'edges': 0, 'triangles': 0, 'mesh_bytes': 0}
+        return {'vertices': len(self.vertices), 'faces': self.faces.count,
+                'edges': len(self.geometry.edges), 'triangles': len(self.geometry.triangles),
+                'mesh_bytes': model_nbytes(self.vertices, self.faces, self.geometry)}
+
+    def record_load(self, filename, phases):
+        self.load_phases = phases
+        self.log_profile({'event': 'load', 'file': filename, 'phases': phases,
+                          'total': sum(phases.values()), **self.model_stats()})
+
+    def record_frame(self, phases):
+        total = sum(phases.values())
+        self.frame_times.append(total)
+        self.last_frame = {'event': 'frame', 'backend': self.backend_var.get(),
+                           'phases': phases, 'total': total,
+                           'average': sum(self.frame_times) / len(self.frame_times),
+                           **self.model_stats()}
+        self.log_profile(self.last_frame)
+        if self.show_hud_var.get():
+            self.update_hud()
+
+    def log_profile(self, record):
+        """Append a record to the JSON lines file named by PROFILE_LOG_ENV."""
+        if not self.profile_log:
+            return
+        try:
+            with open(self.profile_log, 'a') as file:
+                file.write(json.dumps({'time': time.time(), **record}) + '\n')
+        except OSError:
+            self.profile_log = None  # Stop trying after the first failure
+
+    def update_hud(self):
+        frame = self.last_frame
+        if frame is None:
+            return
+        lines = [f"Frame {frame['total'] * 1000:7.1f} ms  "
+                 f"(avg {frame['average'] * 1000:.1f} ms over {len(self.frame_times)})"]
+        lines += [f"  {name:<12}{seconds * 1000:7.1f} ms" for name, seconds in frame['phases'].items()]
+        if self.load_phases:
+            lines.append(f"Load  {sum(self.load_phases.values()):7.2f} s")
+            lines += [f"  {name:<12}{seconds:7.2f} s" for name, seconds in self.load_phases.items()]
+        lines.append(f"Vertices {frame['vertices']:,}  Faces {frame['faces']:,}")
+        lines.append(f"Edges {frame['edges']:,}  Triangles {frame['triangles']:,}")
+        lines.append(f"Mesh arrays {frame['mesh_bytes'] / 2**20:.1f} MB")
+        self.performance_hud.config(text='\n'.join(lines))
+
+    def toggle_hud(self):
+        self.ensure_plot()
+        if self.show_hud_var.get():
+            self.update_hud()
+            self.performance_hud.place(x=8, y=8)
+            self.performance_hud.lift()
+        else:
+            self.performance_hud.place_forget()
+
+    def software_press(self, event):
+        self.drag_start = (event.x, event.y)
+        self.press_position = (event.x, event.y)
 
-    def toggle_wireframe(self):
-        self.update_plot()
+    def software_drag(self, event):
+        if not self.model_loaded or self.drag_start is None:
+            return
+        dx, dy = event.x - self.drag_start[0], event.y - self.drag_start[1]
+        self.drag_start = (event.x, event.y)
+
+        # Same rate as the default mplot3d mouse rotation
+        width = max(self.software_canvas.winfo_width(), 1)
+        height = max(self.software_canvas.winfo_height(), 1)
+        self.ax.view_init(elev=self.ax.elev + dy / height * 180,
+                          azim=self.ax.azim - dx / width * 180)
+        self.request_redraw('camera')
+
+    def software_wheel(self, event):
+        if not self.model_loaded:
+            return
+        zoom_in = event.num == 4 or event.delta > 0
+        self.software_zoom *= 1.1 if zoom_in else 1 / 1.1
+        self.request_redraw('camera')
+
+    def build_scene(self):
+        """Reset the axes for a newly loaded model."""
+        self.ax.clear()
+        setup_model_axes(self.ax, self.geometry.bounds, self.background_color)
+
+        self.mesh_collection = None
+        self.wire_collection = None
+        self.lod_geometry = None
+        self.lod_mesh_collection = None
+        self.lod_wire_collection = None
+        self.software_zoom = 1.0
+        self.picked = self.hovered = self.pick_artist = None
+        self.scene_geometry = self.geometry
+
+    def create_layers(self, geometry, mesh_collection, wire_collection):
+        """Create the missing artists of enabled layers for one level of detail."""
+        # 1. Filled Faces (if show_faces_var is True)
+        if self.show_faces_var.get() and mesh_collection is None and len(geometry.triangles) > 0:
+            mesh_collection = make_face_collection(geometry, self.face_color, self.cull_faces_var.get())
+            self.ax.add_collection3d(mesh_collection)
+
+        # 2. Wireframe (if wireframe_var is True)
+        if self.wireframe_var.get() and wire_collection is None and len(geometry.edges) > 0:
+            wire_collection = make_wire_collection(geometry, self.wireframe_color, self.feature_angle())
+            self.ax.add_collection(wire_collection)
+
+        return mesh_collection, wire_collection
+
+    def sync_scene(self):
+        """Create the artists of enabled layers on first use and apply visibility.
+
+        While the view is being dragged the finest level of detail within
+        the budget is shown in place of the full model.
+        """
+        level = self.geometry
+        if self.interacting:
+            level = self.geometry.level_for(self.lod_budget_var.get() * 1000,
+                                            self.wireframe_var.get(), self.show_faces_var.get())
+
+        full = level is self.geometry
+        if full:
+            self.mesh_collection, self.wire_collection = self.create_layers(
+                level, self.mesh_collection, self.wire_collection)
+        else:
+            if level is not self.lod_geometry:
+                for collection in (self.lod_mesh_collection, self.lod_wire_collection):
+                    if collection is not None:
+                        collection.remove()
+                self.lod_geometry = level
+                self.lod_mesh_collection = self.lod_wire_collection = None
+            self.lod_mesh_collection, self.lod_wire_collection = self.create_layers(
+                level, self.lod_mesh_collection, self.lod_wire_collection)
+
+        for collection, shown, variable in ((self.mesh_collection, full, self.show_faces_var),
+                                            (self.wire_collection, full, self.wireframe_var),
+                                            (self.lod_mesh_collection, not full, self.show_faces_var),
+                                            (self.lod_wire_collection, not full, self.wireframe_var)):
+            if collection is not None:
+                collection.set_visible(shown and variable.get())
+        for collection in (self.mesh_collection, self.lod_mesh_collection):
+            if collection is not None:
+                collection.culling = self.cull_faces_var.get()
+        for collection in (self.wire_collection, self.lod_wire_collection):
+            if collection is not None:
+                collection.feature_angle = self.feature_angle()
+
+    def toggle_visibility(self):
+        self.request_redraw('visibility')
+
+    def press_view(self, event):
+        self.press_position = (event.x, event.y)
+        # A coarse level still shown stays up until this press is released
+        if self.idle_timer is not None:
+            self.root.after_cancel(self.idle_timer)
+            self.idle_timer = None
+
+    def dragged(self, event):
+        """Whether the mouse moved away from where its button was pressed."""
+        start = self.press_position
+        return start is not None and (abs(event.x - start[0]) > 3 or abs(event.y - start[1]) > 3)
+
+    def start_interaction(self, event):
+        if event.button is None or not self.dragged(event):
+            return
+        if not self.model_loaded or self.geometry is None or event.inaxes is not self.ax:
+            return
+        if not self.interacting:
+            self.interacting = True
+            self.request_redraw('visibility')
+
+    def schedule_full_detail(self, event=None):
+        if self.interacting:
+            if self.idle_timer is not None:
+                self.root.after_cancel(self.idle_timer)
+            self.idle_timer = self.root.after(LOD_IDLE_MS, self.show_full_detail)
+
+    def show_full_detail(self):
+        self.idle_timer = None
+        if self.interacting:
+            self.interacting = False
+            self.request_redraw('visibility')
+
+    def screen_projection(self):
+        """Function taking (N, 3) data points to the active viewport's screen
+        coordinates, and a key that changes whenever that mapping does.
+
+        Coordinates are those of the viewport's mouse events: Tk pixels for
+        the software viewport, matplotlib display pixels otherwise.
+        """
+        if self.backend_var.get() == 'software':
+            width = max(self.software_canvas.winfo_width(), 1)
+            height = max(self.software_canvas.winfo_height(), 1)
+            camera = (width, height, self.ax.elev, self.ax.azim, self.software_zoom)
+            view, offset, _ = self.software_renderer.view_transform(self.geometry.bounds, *camera)
+
+            def project(points):
+                return (points @ view.T + offset)[:, :2]
+            return project, ('software',) + camera
+
+        # The projection of the axes as last drawn
+        M = self.ax.M
+        transform = self.ax.transData
+
+        def project(points):
+            projected = points.astype(np.float64) @ M[:, :3].T + M[:, 3]
+            return transform.transform(projected[:, :2] / projected[:, 3:])
+        return project, ('matplotlib', M.tobytes(), tuple(self.ax.bbox.bounds),
+                         tuple(self.ax.viewLim.bounds))
+
+    def pick_at(self, x, y):
+        """('vertex' or 'edge', index) of the model under screen point (x, y),
+        or None."""
+        if not self.model_loaded or self.geometry is None or self.geometry.pick_index is None:
+            return None
+        project, key = self.screen_projection()
+        pick = self.geometry.pick_index.pick(project, key, x, y)
+        return None if pick is None else pick[:2]
+
+    def pick_points(self, pick):
+        kind, index = pick
+        if kind == 'vertex':
+            return self.vertices[[index]].astype(np.float64)
+        return self.vertices[self.geometry.edges[index]].astype(np.float64)
+
+    def describe_pick(self, pick):
+        kind, index = pick
+        if kind == 'vertex':
+            x, y, z = self.vertices[index]
+            return f"Vertex {index:,}: ({x:.4g}, {y:.4g}, {z:.4g})"
+        lines = [f"Edge {index:,}:"]
+        for vertex in self.geometry.edges[index]:
+            x, y, z = self.vertices[vertex]
+            lines.append(f"vertex {vertex:,} ({x:.4g}, {y:.4g}, {z:.4g})")
+        return '\n'.join(lines)
+
+    def show_pick_status(self):
+        if self.load_job is not None:
+            return  # Keep the loading message
+        pick = self.hovered or self.picked
+        if pick is not None:
+            self.status_label.config(text=self.describe_pick(pick))
+        elif self.model_loaded:
+            self.status_label.config(text=f"Loaded: {os.path.basename(self.current_file)}")
+
+    def hover_pick(self, event):
+        """Read out the vertex or edge under the cursor."""
+        if not self.model_loaded or self.fig is None or self.scene_geometry is None:
+            return
+        software = self.backend_var.get() == 'software'
+        if not software and (event.button is not None or event.inaxes is not self.ax):
+            return
+        hovered = self.pick_at(event.x, event.y)
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.show_pick_status()
+            if software:
+                self.draw_pick_overlay()
+
+    def click_pick(self, event):
+        """Pick the vertex or edge under a click that did not drag the view."""
+        dragged = self.press_position is None or self.dragged(event)
+        self.press_position = None
+        if not self.model_loaded or self.scene_geometry is None or dragged:
+            return
+        software = self.backend_var.get() == 'software'
+        if not software and event.inaxes is not self.ax:
+            return
+        picked = self.pick_at(event.x, event.y)
+        if picked == self.picked:
+            return  # The highlight already shows it
+        self.picked = picked
+        self.show_pick_status()
+        if software:
+            self.draw_pick_overlay()
+        else:
+            self.sync_pick_artist()
+
+    def sync_pick_artist(self):
+        """Move the highlight of the matplotlib viewport to the picked element."""
+        if self.picked is None:
+            if self.pick_artist is not None:
+                self.pick_artist.set_visible(False)
+        else:
+            points = self.pick_points(self.picked)
+            if self.pick_artist is None:
+                self.pick_artist, = self.ax.plot(*points.T, color=PICK_COLOR, marker='o',
+                                                 markersize=8, linewidth=3, zorder=10)
+            self.pick_artist.set_data_3d(*points.T)
+            self.pick_artist.set_visible(True)
+        self.request_redraw('pick')
+
+    def draw_pick_overlay(self):
+        """Draw the hovered or picked element over the software viewport
+        image, without rasterizing the model again."""
+        canvas = self.software_canvas
+        canvas.delete('pick')
+        pick = self.hovered or self.picked
+        if pick is None or self.backend_var.get() != 'software':
+            return
+        project, _ = self.screen_projection()
+        points = project(self.pick_points(pick))
+        if len(points) == 2:
+            canvas.create_line(*points.ravel(), fill=PICK_COLOR, width=3, tags='pick')
+        for x, y in points:
+            canvas.create_oval(x - 4, y - 4, x + 4, y + 4, outline=PICK_COLOR, width=2, tags='pick')
+
+    def feature_angle(self):
+        """Angle of the feature edge mode, or None while every edge is drawn."""
+        return self.feature_angle_var.get() if self.feature_edges_var.get() else None
+
+    def change_feature_angle(self, value=None):
+        if self.feature_edges_var.get():
+            self.request_redraw('visibility')
+
+    def toggle_culling(self):
+        self.request_redraw('visibility')
 
     def front_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=0, azim=0)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['front'])
+            self.request_redraw('camera')
 
     def back_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=0, azim=180)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['back'])
+            self.request_redraw('camera')
 
     def left_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=0, azim=90)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['left'])
+            self.request_redraw('camera')
 
     def right_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=0, azim=-90)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['right'])
+            self.request_redraw('camera')
 
     def top_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=90, azim=0)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['top'])
+            self.request_redraw('camera')
 
     def bottom_view(self):
         if self.model_loaded:
-            self.ax.view_init(elev=-90, azim=0)
-            self.update_plot()
+            self.ax.view_init(*VIEWS['bottom'])
+            self.request_redraw('camera')
 
     def take_render(self):
         if not self.model_loaded:
@@ -570,6 +3074,14 @@ class WireframeViewer:
         )
 
         if filename:
+            # Renders always use the full model, drawn by matplotlib
+            # whichever viewport is active
+            if self.idle_timer is not None:
+                self.root.after_cancel(self.idle_timer)
+                self.idle_timer = None
+            self.interacting = False
+            self.sync_scene()
+
             try:
                 self.fig.savefig(filename, facecolor=self.background_color, dpi=300, bbox_inches='tight')
                 messagebox.showinfo("Success", f"Render saved to:\n{filename}")
@@ -580,7 +3092,339 @@ class WireframeViewer:
         self.root.quit()
         self.root.destroy()
 
-if __name__ == "__main__":
+# Headless batch rendering
+
+def batch_load_options(options):
+    """load_mesh keyword arguments of the command line options."""
+    return {'cache': MeshCache() if options.cache else None, 'weld': options.weld,
+            'weld_tolerance': options.weld_tolerance}
+
+
+def make_agg_scene(geometry, options, dpi=100):
+    """Figure and 3D axes on the Agg backend showing a model as the command
+    line options ask."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import_matplotlib()
+
+    fig = Figure(figsize=(8, 6), dpi=dpi, facecolor=options.background_color)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    setup_model_axes(ax, geometry.bounds, options.background_color)
+    if options.faces and len(geometry.triangles) > 0:
+        ax.add_collection3d(make_face_collection(geometry, options.face_color, options.cull))
+    if options.wireframe and len(geometry.edges) > 0:
+        ax.add_collection(make_wire_collection(geometry, options.wireframe_color,
+                                               options.feature_angle))
+    return fig, ax
+
+
+def find_models(patterns):
+    """Model files matching a list of file names and glob patterns."""
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        filenames.extend(name for name in matches
+                         if os.path.splitext(name)[1].lower() in MESH_READERS)
+    return list(dict.fromkeys(filenames))
+
+
+def stale_outputs(filename, outputs, force=False):
+    """The outputs, by key, that are missing or older than their model."""
+    if force or not os.path.exists(filename):
+        return outputs
+    modified = os.path.getmtime(filename)
+    return {key: output for key, output in outputs.items()
+            if not os.path.exists(output) or os.path.getmtime(output) < modified}
+
+
+def render_outputs(filename, views, output_dir):
+    """Image paths a batch render of one model writes, by view."""
+    name = os.path.basename(filename)
+    return {view: os.path.join(output_dir, f"{name}.{view}.png") for view in views}
+
+
+def render_model(filename, outputs, options):
+    """Render one model to an image per view on the Agg backend.
+
+    Runs in a worker process of batch_render. Returns (filename, load time,
+    render time, error message or None).
+    """
+    start = time.perf_counter()
+    try:
+        vertices, faces, geometry = load_mesh(filename, **batch_load_options(options))
+        loaded = time.perf_counter()
+
+        fig, ax = make_agg_scene(geometry, options)
+        for view, output in outputs.items():
+            ax.view_init(*VIEWS[view])
+            fig.savefig(output, facecolor=options.background_color, dpi=options.dpi, bbox_inches='tight')
+    except Exception as e:
+        return filename, time.perf_counter() - start, 0.0, str(e)
+    return filename, loaded - start, time.perf_counter() - loaded, None
+
+
+def batch_render(options):
+    """Render every model matching the input globs across a process pool."""
+    filenames = find_models(options.inputs)
+    if not filenames:
+        print("No OBJ, PLY or STL files match the given inputs", file=sys.stderr)
+        return 1
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    tasks = []
+    skipped = 0
+    for filename in filenames:
+        # Only render views older than the model
+        outputs = stale_outputs(filename, render_outputs(filename, options.views, options.output_dir),
+                                options.force)
+        if outputs:
+            tasks.append((filename, outputs))
+        else:
+            skipped += 1
+
+    start = time.perf_counter()
+    if options.jobs == 1 or len(tasks) <= 1:
+        results = [render_model(filename, outputs, options) for filename, outputs in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs) as pool:
+            futures = [pool.submit(render_model, filename, outputs, options) for filename, outputs in tasks]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    width = max([len(filename) for filename, _, _, _ in results] + [4])
+    if results:
+        print(f"{'File':<{width}}  {'Load':>8}  {'Render':>8}")
+    for filename, load_time, render_time, error in results:
+        if error is None:
+            print(f"{filename:<{width}}  {load_time:7.2f}s  {render_time:7.2f}s")
+        else:
+            failed += 1
+            print(f"{filename:<{width}}  failed: {error}")
+    print(f"Rendered {len(results) - failed} models, skipped {skipped} up to date, "
+          f"{failed} failed in {elapsed:.2f}s with {options.jobs} workers")
+    return 1 if failed else 0
+
+
+# Headless turntable and contact sheet export
+
+# Scene a frame worker process draws, built once by _init_frame_worker
+_frame_scene = None
+
+
+def animation_outputs(filename, options):
+    """Image paths an animation export of one model writes."""
+    name = os.path.join(options.output_dir, os.path.basename(filename))
+    if options.contact_sheet:
+        return {'sheet': f"{name}.contact.png"}
+    if options.gif:
+        return {'gif': f"{name}.turntable.gif"}
+    return {frame: f"{name}.turntable.{frame:04d}.png" for frame in range(options.turntable)}
+
+
+def animation_frames(filename, options):
+    """(label, elevation, azimuth, output path or None) of every frame.
+
+    Frames without an output path are returned by render_frame, to be put
+    together into a GIF or contact sheet.
+    """
+    if options.contact_sheet:
+        return [(view, *VIEWS[view], None) for view in options.views]
+    outputs = animation_outputs(filename, options)
+    return [(None, options.elevation, 360.0 * frame / options.turntable,
+             None if options.gif else outputs[frame])
+            for frame in range(options.turntable)]
+
+
+def _init_frame_worker(vertices, edges, triangles, options):
+    """Build the scene of a model once in every frame worker process."""
+    global _frame_scene
+    geometry = RenderGeometry(vertices, None, edges, triangles)
+    fig, ax = make_agg_scene(geometry, options, options.dpi)
+    label = fig.text(0.02, 0.98, '', color='white', va='top', fontsize=14)
+    _frame_scene = fig, ax, label
+
+
+def render_frame(frame):
+    """Draw one frame of the worker's scene.
+
+    Writes the frame when it has an output path, otherwise returns it as an
+    (height, width, 3) uint8 array.
+    """
+    from matplotlib import image
+    fig, ax, label = _frame_scene
+    text, elev, azim, output = frame
+    ax.view_init(elev, azim)
+    label.set_text(text or '')
+    fig.canvas.draw()
+    pixels = np.asarray(fig.canvas.buffer_rgba())[..., :3]
+    if output is None:
+        return pixels.copy()
+    image.imsave(output, pixels)
+    return None
+
+
+def contact_sheet(images, background_color, columns=3):
+    """Tile same sized frames into one image, row by row."""
+    from matplotlib import colors
+    columns = min(columns, len(images))
+    blank = np.empty_like(images[0])
+    blank[...] = np.round(np.array(colors.to_rgb(background_color)) * 255)
+    images = images + [blank] * (-len(images) % columns)
+    rows = [np.concatenate(images[i:i + columns], axis=1) for i in range(0, len(images), columns)]
+    return np.concatenate(rows, axis=0)
+
+
+def export_animation(options):
+    """Render turntables or contact sheets of every model matching the input
+    globs, drawing the frames of each across a process pool."""
+    from matplotlib import image
+    filenames = find_models(options.inputs)
+    if not filenames:
+        print("No OBJ, PLY or STL files match the given inputs", file=sys.stderr)
+        return 1
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    failed = skipped = 0
+    for filename in filenames:
+        outputs = animation_outputs(filename, options)
+        if not stale_outputs(filename, outputs, options.force):
+            skipped += 1
+            continue
+
+        try:
+            start = time.perf_counter()
+            vertices, faces, geometry = load_mesh(filename, **batch_load_options(options))
+            loaded = time.perf_counter()
+
+            # Workers get the vertices and index buffers built here instead
+            # of loading the model again. Feature edges are picked here too,
+            # as the workers only get the triangles they draw
+            frames = animation_frames(filename, options)
+            edges = geometry.edges[:0]
+            if options.wireframe:
+                edges = (geometry.edges if options.feature_angle is None
+                         else geometry.feature_edges(options.feature_angle))
+            scene = (geometry.vertices, edges,
+                     geometry.triangles if options.faces else geometry.triangles[:0],
+                     argparse.Namespace(**{**vars(options), 'feature_angle': None}))
+            workers = min(options.jobs, len(frames))
+            if workers == 1:
+                _init_frame_worker(*scene)
+                images = [render_frame(frame) for frame in frames]
+            else:
+                with concurrent.futures.ProcessPoolExecutor(
+                        max_workers=workers, initializer=_init_frame_worker, initargs=scene) as pool:
+                    images = list(pool.map(render_frame, frames,
+                                           chunksize=max(1, len(frames) // (4 * workers))))
+            rendered = time.perf_counter()
+
+            if options.contact_sheet:
+                image.imsave(outputs['sheet'], contact_sheet(images, options.background_color))
+            elif options.gif:
+                from PIL import Image
+                pictures = [Image.fromarray(pixels) for pixels in images]
+                pictures[0].save(outputs['gif'], save_all=True, append_images=pictures[1:],
+                               duration=round(1000 / options.fps), loop=0)
+        except Exception as e:
+            failed += 1
+            print(f"{filename}  failed: {e}")
+            continue
+        elapsed = rendered - loaded
+        print(f"{filename}  load {loaded - start:.2f}s, {len(frames)} frames in {elapsed:.2f}s "
+              f"({len(frames) / elapsed:.1f} fps) with {workers} workers")
+
+    print(f"Exported {len(filenames) - skipped - failed} models, skipped {skipped} up to date, "
+          f"{failed} failed")
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="3D Wireframe Viewer. Opens the viewer window, or renders "
+                    "the given models to images without a window.")
+    parser.add_argument('inputs', nargs='*',
+                        help="model files or glob patterns to render headless")
+    parser.add_argument('-o', '--output-dir', default='renders',
+                        help="directory for the rendered images (default: renders)")
+    parser.add_argument('--views',
+                        type=lambda text: [view.strip() for view in text.split(',') if view.strip()],
+                        help="comma separated camera presets: " + ", ".join(VIEWS) +
+                             " (default: front, or all of them for a contact sheet)")
+    parser.add_argument('--dpi', type=int,
+                        help="image resolution (default: 300, 100 for turntables and contact sheets)")
+    parser.add_argument('--turntable', type=int, metavar='FRAMES',
+                        help="render FRAMES frames around the model as a numbered PNG sequence")
+    parser.add_argument('--elevation', type=float, default=20.0,
+                        help="camera elevation of the turntable in degrees (default: 20)")
+    parser.add_argument('--gif', action='store_true',
+                        help="write the turntable as an animated GIF")
+    parser.add_argument('--fps', type=float, default=24.0,
+                        help="frame rate of the GIF (default: 24)")
+    parser.add_argument('--contact-sheet', action='store_true',
+                        help="render the views side by side into one image")
+    parser.add_argument('--wireframe-color', default='#00ffff')
+    parser.add_argument('--face-color', default='#007acc')
+    parser.add_argument('--background-color', default='#000000')
+    parser.add_argument('--faces', action='store_true', help="draw the filled faces")
+    parser.add_argument('--no-wireframe', dest='wireframe', action='store_false',
+                        help="do not draw the wireframe")
+    parser.add_argument('--cull', action='store_true', help="cull back faces")
+    parser.add_argument('--feature-angle', type=float, metavar='DEGREES',
+                        help="draw only boundary edges and edges whose faces meet at more "
+                             "than DEGREES")
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help="do not use the mesh cache")
+    parser.add_argument('--weld', action='store_true', default=None,
+                        help="merge duplicate vertices of every format, not just STL")
+    parser.add_argument('--no-weld', dest='weld', action='store_false',
+                        help="keep the duplicate vertices of STL files")
+    parser.add_argument('--weld-tolerance', type=float, default=0.0,
+                        help="distance within which welded vertices merge (default: exact)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('-f', '--force', action='store_true',
+                        help="render even when the images are newer than the model")
+    options = parser.parse_args(argv)
+
+    animation = options.turntable is not None or options.contact_sheet
+    if options.views is None:
+        options.views = list(VIEWS) if options.contact_sheet else ['front']
+    if options.dpi is None:
+        options.dpi = 100 if animation else 300
+
+    unknown = [view for view in options.views if view not in VIEWS]
+    if unknown:
+        parser.error(f"unknown view: {', '.join(unknown)}")
+    if options.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if options.turntable is not None and options.contact_sheet:
+        parser.error("--turntable and --contact-sheet cannot be combined")
+    if options.turntable is not None and options.turntable < 1:
+        parser.error("--turntable must be at least 1 frame")
+    if options.gif and options.turntable is None:
+        parser.error("--gif needs --turntable")
+    if options.fps <= 0:
+        parser.error("--fps must be positive")
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.inputs and (options.turntable is not None or options.contact_sheet):
+        return export_animation(options)
+    if options.inputs:
+        return batch_render(options)
+
     root = tk.Tk()
     app = WireframeViewer(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    # Spawned workers of a frozen (PyInstaller) build run this script too,
+    # and must become workers instead of parsing the command line
+    multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""Benchmarks for every stage of the 3D Wireframe Viewer pipeline.
+
+Generates synthetic meshes, writes them in every supported file format and
+times loading, edge extraction, triangulation, drawing and rendering on the
+Agg backend, without a display. Results are written as JSON so two runs can
+be compared:
+
+    python benchmark.py --sizes 20000,200000 -o before.json
+    python benchmark.py --sizes 20000,200000 -o after.json
+    python benchmark.py --compare before.json after.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+import numpy as np
+
+import Motor3d
+
+MESHES = ('grid', 'sphere', 'soup', 'quads', 'ngons')
+FORMATS = ('obj', 'ply-ascii', 'ply-binary', 'stl-ascii', 'stl-binary')
+STAGES = ('load_model', 'unique_edges', 'triangulate', 'update_plot',
+          'take_render', 'software_render', 'pick_index', 'pick', 'edge_angles')
+
+
+# Synthetic meshes, each returned as (vertices, face_sizes, face_indices) for
+# about `count` faces
+
+def _grid_points(columns, rows):
+    """Vertices of a (columns + 1) x (rows + 1) grid with a wavy height."""
+    x, y = np.meshgrid(np.linspace(-1, 1, columns + 1), np.linspace(-1, 1, rows + 1))
+    z = 0.2 * np.sin(3 * x) * np.cos(3 * y)
+    return np.stack((x, y, z), axis=-1).reshape(-1, 3).astype(np.float32)
+
+
+def _grid_cells(columns, rows):
+    """Corner indices (a, b, c, d) of every cell of a grid, counter-clockwise."""
+    row, column = np.meshgrid(np.arange(rows), np.arange(columns), indexing='ij')
+    a = (row * (columns + 1) + column).ravel()
+    return a, a + 1, a + columns + 2, a + columns + 1
+
+
+def _uniform(vertices, faces):
+    faces = np.asarray(faces, dtype=np.int32)
+    return vertices, np.full(len(faces), faces.shape[1], dtype=np.int32), faces.ravel()
+
+
+def make_grid(count):
+    side = max(int(np.sqrt(count / 2)), 1)
+    a, b, c, d = _grid_cells(side, side)
+    triangles = np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+    return _uniform(_grid_points(side, side), triangles)
+
+
+def make_quads(count):
+    side = max(int(np.sqrt(count)), 1)
+    return _uniform(_grid_points(side, side), np.stack(_grid_cells(side, side), axis=1))
+
+
+def make_sphere(count):
+    rings = max(int(np.sqrt(count / 2)), 2)
+    segments = 2 * rings
+    theta = np.linspace(0, np.pi, rings + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing='ij')
+    ring_points = np.stack((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi),
+                            np.cos(theta)), axis=-1).reshape(-1, 3)
+    vertices = np.concatenate(([[0, 0, 1]], ring_points, [[0, 0, -1]])).astype(np.float32)
+
+    # Quads between neighbouring rings split in two, fans at the poles
+    ring, segment = np.meshgrid(np.arange(rings - 2), np.arange(segments), indexing='ij')
+    a = 1 + ring * segments + segment
+    b = 1 + ring * segments + (segment + 1) % segments
+    c, d = b + segments, a + segments
+    following = 1 + (np.arange(segments) + 1) % segments
+    last = len(vertices) - 1
+    triangles = np.concatenate((
+        np.stack((np.zeros(segments, dtype=int), 1 + np.arange(segments), following), axis=1),
+        np.stack((a.ravel(), d.ravel(), c.ravel()), axis=1),
+        np.stack((a.ravel(), c.ravel(), b.ravel()), axis=1),
+        np.stack((last - segments + np.arange(segments), np.full(segments, last),
+                  last - segments + (np.arange(segments) + 1) % segments), axis=1)))
+    return _uniform(vertices, triangles)
+
+
+def make_soup(count):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-1, 1, (count, 1, 3))
+    vertices = (centers + rng.normal(0, 0.02, (count, 3, 3))).reshape(-1, 3).astype(np.float32)
+    return _uniform(vertices, np.arange(3 * count).reshape(-1, 3))
+
+
+def make_ngons(count):
+    """Quads on even rows, hexagons covering two cells on odd rows."""
+    side = max(int(np.sqrt(count * 4 / 3)) // 2 * 2, 2)
+    a, b, c, d = (corner.reshape(side, side) for corner in _grid_cells(side, side))
+    quads = np.stack((a[::2], b[::2], c[::2], d[::2]), axis=-1).reshape(-1, 4)
+    hexagons = np.stack((a[1::2, ::2], b[1::2, ::2], b[1::2, 1::2], c[1::2, 1::2],
+                         c[1::2, ::2], d[1::2, ::2]), axis=-1).reshape(-1, 6)
+    sizes = np.concatenate((np.full(len(quads), 4), np.full(len(hexagons), 6)))
+    return (_grid_points(side, side), sizes.astype(np.int32),
+            np.concatenate((quads.ravel(), hexagons.ravel())).astype(np.int32))
+
+
+GENERATORS = {'grid': make_grid, 'sphere': make_sphere, 'soup': make_soup,
+              'quads': make_quads, 'ngons': make_ngons}
+
+
+# Writers for every format the viewer reads
+
+def _face_groups(sizes, indices):
+    """Yield (size, (F, size) indices) for the faces of every polygon size."""
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    for size in np.unique(sizes):
+        picked = np.flatnonzero(sizes == size)
+        yield size, indices[offsets[picked][:, None] + np.arange(size)]
+
+
+def _triangles(sizes, indices):
+    return Motor3d.FaceArray(sizes, indices).triangulate()
+
+
+def write_obj(path, vertices, sizes, indices):
+    with open(path, 'w') as file:
+        np.savetxt(file, vertices, fmt='v %.6f %.6f %.6f')
+        for size, faces in _face_groups(sizes, indices):
+            np.savetxt(file, faces + 1, fmt='f' + ' %d' * size)
+
+
+def _ply_header(file_format, vertex_count, face_count):
+    return (f"ply\nformat {file_format} 1.0\n"
+            f"element vertex {vertex_count}\n"
+            "property float x\nproperty float y\nproperty float z\n"
+            f"element face {face_count}\n"
+            "property list uchar int vertex_indices\nend_header\n")
+
+
+def write_ply_ascii(path, vertices, sizes, indices):
+    with open(path, 'w') as file:
+        file.write(_ply_header('ascii', len(vertices), len(sizes)))
+        np.savetxt(file, vertices, fmt='%.6f %.6f %.6f')
+        for size, faces in _face_groups(sizes, indices):
+            np.savetxt(file, faces, fmt=str(size) + ' %d' * size)
+
+
+def write_ply_binary(path, vertices, sizes, indices):
+    with open(path, 'wb') as file:
+        file.write(_ply_header('binary_little_endian', len(vertices), len(sizes)).encode())
+        file.write(vertices.astype('<f4').tobytes())
+        for size, faces in _face_groups(sizes, indices):
+            records = np.empty(len(faces), dtype=[('size', 'u1'), ('indices', '<i4', (size,))])
+            records['size'] = size
+            records['indices'] = faces
+            file.write(records.tobytes())
+
+
+def write_stl_ascii(path, vertices, sizes, indices):
+    corners = vertices[_triangles(sizes, indices)].reshape(-1, 9)
+    with open(path, 'w') as file:
+        file.write("solid benchmark\n")
+        np.savetxt(file, corners, fmt="facet normal 0 0 0\n outer loop\n"
+                   "  vertex %.6f %.6f %.6f\n  vertex %.6f %.6f %.6f\n  vertex %.6f %.6f %.6f\n"
+                   " endloop\nendfacet")
+        file.write("endsolid benchmark\n")
+
+
+def write_stl_binary(path, vertices, sizes, indices):
+    triangles = _triangles(sizes, indices)
+    records = np.zeros(len(triangles), dtype=Motor3d.STL_RECORD)
+    records['vertices'] = vertices[triangles]
+    with open(path, 'wb') as file:
+        file.write(b'benchmark'.ljust(80, b' '))
+        file.write(np.uint32(len(records)).tobytes())
+        file.write(records.tobytes())
+
+
+WRITERS = {
+    'obj': ('.obj', write_obj),
+    'ply-ascii': ('.ply', write_ply_ascii),
+    'ply-binary': ('.ply', write_ply_binary),
+    'stl-ascii': ('.stl', write_stl_ascii),
+    'stl-binary': ('.stl', write_stl_binary),
+}
+
+
+# Stages. Every stage is a setup function returning the timed function, so
+# that each repetition starts from the same state
+
+def _scene_options(options):
+    """Command line options of Motor3d drawing the scene this run asks for."""
+    return Motor3d.parse_args((['--faces'] if options.faces else []) +
+                              (['--cull'] if options.cull else []))
+
+
+def setup_stage(stage, path, model, options):
+    vertices, faces, geometry = model
+
+    def fresh_geometry():
+        # Per-view buffers of a new model are built on its first draw
+        return Motor3d.RenderGeometry(vertices, faces, geometry.edges, geometry.triangles)
+
+    if stage == 'load_model':
+        def run():
+            loaded = Motor3d.load_mesh(path)
+            loaded[2].build_levels()
+            loaded[2].build_pick_index()
+        return run
+    if stage == 'unique_edges':
+        return faces.unique_edges
+    if stage == 'triangulate':
+        return faces.triangulate
+    if stage == 'update_plot':
+        # Scene of a newly loaded model, built as the batch renderer does
+        scene = fresh_geometry()
+        scene_options = _scene_options(options)
+        return lambda: Motor3d.make_agg_scene(scene, scene_options)[0].canvas.draw()
+    if stage == 'take_render':
+        fig, _ = Motor3d.make_agg_scene(fresh_geometry(), _scene_options(options))
+        fig.canvas.draw()
+        return lambda: fig.savefig(io.BytesIO(), format='png', facecolor='#000000',
+                                   dpi=options.dpi, bbox_inches='tight')
+    if stage == 'software_render':
+        renderer = Motor3d.SoftwareRenderer()
+        scene = fresh_geometry()
+        return lambda: renderer.render(scene, 800, 600, 30, -60, faces=options.faces,
+                                       culling=options.cull)
+    if stage == 'pick_index':
+        return fresh_geometry().build_pick_index
+    if stage == 'pick':
+        # A hundred picks on a still software view, as when hovering
+        scene = fresh_geometry()
+        scene.build_pick_index()
+        view, offset, _ = Motor3d.SoftwareRenderer().view_transform(
+            scene.bounds, 800, 600, 30, -60, 1.0)
+        points = np.random.default_rng(0).uniform((200, 150), (600, 450), (100, 2))
+
+        def project(coords):
+            return (coords @ view.T + offset)[:, :2]
+
+        def run():
+            for x, y in points:
+                scene.pick_index.pick(project, 'still', x, y)
+        return run
+    if stage == 'edge_angles':
+        return lambda: fresh_geometry().edge_angles
+    raise ValueError(f"Unknown stage {stage}")
+
+
+def measure(stage, path, model, options):
+    """Time a stage `options.repeat` times, then trace its peak memory once."""
+    samples = []
+    for _ in range(options.repeat):
+        run = setup_stage(stage, path, model, options)
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+
+    run = setup_stage(stage, path, model, options)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    run()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return {'seconds': min(samples), 'median_seconds': statistics.median(samples),
+            'samples': samples, 'peak_bytes': peak}
+
+
+def run_benchmarks(options, directory):
+    results = []
+    for mesh in options.meshes:
+        for size in options.sizes:
+            vertices, sizes, indices = GENERATORS[mesh](size)
+            model = None
+            for file_format in options.formats:
+                extension, writer = WRITERS[file_format]
+                path = os.path.join(directory, f"{mesh}-{size}-{file_format}{extension}")
+                writer(path, vertices, sizes, indices)
+                stages = [stage for stage in options.stages
+                          if stage == 'load_model' or model is None]
+                if model is None:
+                    # The other stages run once per mesh, on the first format
+                    model = Motor3d.load_mesh(path)
+                for stage in stages:
+                    result = {'mesh': mesh, 'size': size, 'faces': len(sizes),
+                              'vertices': len(vertices), 'stage': stage,
+                              'format': file_format if stage == 'load_model' else None}
+                    result.update(measure(stage, path, model, options))
+                    results.append(result)
+                    print(f"{mesh:>7} {size:>9} {result['format'] or '-':>10} {stage:<16}"
+                          f"{result['seconds']:9.3f} s {result['peak_bytes'] / 2**20:9.1f} MB",
+                          flush=True)
+                if not options.keep_files:
+                    os.remove(path)
+    return results
+
+
+def _key(result):
+    return result['mesh'], result['size'], result['format'], result['stage']
+
+
+def compare(old_path, new_path, threshold):
+    """Print how every result of a new run compares to an old run.
+
+    Returns the number of stages that got slower by more than `threshold`.
+    """
+    with open(old_path) as file:
+        old = {_key(result): result for result in json.load(file)['results']}
+    with open(new_path) as file:
+        new = json.load(file)['results']
+
+    print(f"{'mesh':>7} {'size':>9} {'format':>10} {'stage':<16}"
+          f"{'old s':>9} {'new s':>9} {'ratio':>7} {'old MB':>9} {'new MB':>9}")
+    slower = 0
+    for result in new:
+        before = old.get(_key(result))
+        if before is None:
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark = '  slower'
+            slower += 1
+        elif ratio < 1 - threshold:
+            mark = '  faster'
+        print(f"{result['mesh']:>7} {result['size']:>9} {result['format'] or '-':>10} "
+              f"{result['stage']:<16}{before['seconds']:9.3f} {result['seconds']:9.3f} "
+              f"{ratio:7.2f} {before['peak_bytes'] / 2**20:9.1f} "
+              f"{result['peak_bytes'] / 2**20:9.1f}{mark}")
+    return slower
+
+
+def _choices(allowed):
+    def parse(text):
+        values = [value.strip() for value in text.split(',') if value.strip()]
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            raise argparse.ArgumentTypeError(
+                f"unknown value {', '.join(unknown)} (choose from {', '.join(allowed)})")
+        return values
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the 3D Wireframe Viewer pipeline on synthetic meshes.")
+    parser.add_argument('--meshes', type=_choices(MESHES), default=list(MESHES),
+                        help=f"comma separated meshes (default: {','.join(MESHES)})")
+    parser.add_argument('--sizes', type=lambda text: [int(v) for v in text.split(',')],
+                        default=[20000], help="comma separated face counts (default: 20000)")
+    parser.add_argument('--formats', type=_choices(FORMATS), default=list(FORMATS),
+                        help=f"comma separated file formats (default: {','.join(FORMATS)})")
+    parser.add_argument('--stages', type=_choices(STAGES), default=list(STAGES),
+                        help=f"comma separated stages (default: {','.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs per stage, the fastest is reported (default: 3)")
+    parser.add_argument('--dpi', type=int, default=300, help="take_render resolution (default: 300)")
+    parser.add_argument('--faces', action='store_true', help="draw the filled faces too")
+    parser.add_argument('--cull', action='store_true', help="cull back faces")
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help="JSON file for the results (default: benchmark.json)")
+    parser.add_argument('--work-dir', help="where to write the mesh files (default: a temporary directory)")
+    parser.add_argument('--keep-files', action='store_true', help="keep the generated mesh files")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative change reported as slower or faster (default: 0.1)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.compare:
+        return 1 if compare(*options.compare, options.threshold) else 0
+
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = options.work_dir or temporary
+        os.makedirs(directory, exist_ok=True)
+        results = run_benchmarks(options, directory)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'system': {'python': platform.python_version(), 'numpy': np.__version__,
+                   'matplotlib': matplotlib.__version__, 'platform': platform.platform(),
+                   'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'options': {'repeat': options.repeat, 'dpi': options.dpi,
+                    'faces': options.faces, 'cull': options.cull},
+        'results': results,
+    }
+    with open(options.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {options.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())